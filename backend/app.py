@@ -3,43 +3,168 @@ Medical PDF Signing Platform - Flask Backend
 100% Open Source
 """
 
+import io
 import os
+import multiprocessing
 import uuid
 import base64
-from datetime import datetime
+import copy
+import hashlib
+import secrets
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import suppress
+from datetime import datetime, timedelta
 from functools import wraps
 
-from flask import Flask, request, jsonify, send_file, session
+from flask import Flask, Request, request, jsonify, send_file, g, current_app
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from sqlalchemy.orm.session import make_transient_to_detached
 from werkzeug.utils import secure_filename
 
 from config import Config
-from models import db, User, Signature, Document
-from encryption import init_encryption, get_encryption, SignatureEncryption
-from signature_processor import process_signature_image, validate_image, get_signature_preview
-from pdf_signer import add_signature_to_pdf, add_f2f_signature_to_pdf, get_pdf_info
-from signature_detector import detect_signature_position, detect_signature_positions_batch, detect_all_signature_positions, detect_f2f_signature_position
+from models import db, User, Signature, Document, Job
+from encryption import init_encryption, get_encryption, SignatureIntegrityError
+from signature_processor import process_signature_image, validate_image
+from pdf_signer import add_signature_to_pdf, add_f2f_signature_to_pdf, add_multiple_signatures, get_pdf_info, load_signature_image, sign_pdfs
+from signature_detector import detect_all_signature_positions, detect_f2f_signature_position
+
+# Use streaming-form-data's C multipart parser if available, fallback to Werkzeug's
+try:
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import FileTarget, ValueTarget
+    HAS_STREAMING_FORM_DATA = True
+except ImportError:
+    HAS_STREAMING_FORM_DATA = False
+
+# Use orjson for JSON responses if available, fallback to Flask's json provider
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson.
+    Honours Flask's sort_keys/compact settings and default() conversions, and
+    builds responses straight from the encoded bytes.
+    """
+
+    @property
+    def option(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option), mimetype=self.mimetype
+        )
+
+# Chunk size used when streaming raw uploads to disk
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+
+
+def spool_upload():
+    """
+    Create a temp file in UPLOAD_FOLDER for an incoming upload.
+    Files that are never moved into place are removed after the request.
+    """
+    spooled = tempfile.NamedTemporaryFile(
+        dir=current_app.config['UPLOAD_FOLDER'], suffix='.part', delete=False
+    )
+    g.setdefault('spooled_uploads', []).append(spooled)
+    return spooled
+
+
+class UploadRequest(Request):
+    """
+    Request that spools uploaded PDFs straight into UPLOAD_FOLDER.
+    upload_document can then move the finished file into place instead
+    of copying it out of a temp file (one write instead of two).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint != 'upload_document':
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return spool_upload()
+
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+app.request_class = UploadRequest
+if HAS_ORJSON:
+    app.json = ORJSONProvider(app)
 
 # Initialize extensions
 CORS(app, supports_credentials=True, origins=['http://localhost:3000', 'http://127.0.0.1:3000'])
 db.init_app(app)
+cache = Cache(app)
 
 # Login manager
 login_manager = LoginManager()
 login_manager.init_app(app)
 
+# Column values of recently loaded users: user_id -> (expires_at, values).
+# Lets authenticated requests skip the per-request user SELECT for USER_CACHE_TTL seconds
+user_cache = {}
+USER_COLUMNS = [column.key for column in inspect(User).column_attrs]
+
+# Loader options for Document.to_dict(): uploader/signer are lazy='raise', so
+# every query that serializes documents joins in just their names
+USER_NAME_ONLY = (load_only(User.id, User.name),)
+DOCUMENT_USERS = (
+    joinedload(Document.uploader).options(*USER_NAME_ONLY),
+    joinedload(Document.signer).options(*USER_NAME_ONLY),
+)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    cached = user_cache.get(user_id)
+    if cached and cached[0] > time.monotonic():
+        # Attach a copy to this request's session without querying; relationships
+        # such as user.signature still load lazily as usual
+        user = User(**cached[1])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        if len(user_cache) >= 1024:
+            user_cache.clear()
+        values = {key: getattr(user, key) for key in USER_COLUMNS}
+        user_cache[user_id] = (time.monotonic() + app.config['USER_CACHE_TTL'], values)
+    return user
 
 # Initialize encryption
 def init_app_encryption():
-    import base64
     key = app.config.get('ENCRYPTION_KEY')
     if key:
         if isinstance(key, str):
@@ -61,9 +186,462 @@ def create_directories():
     os.makedirs(app.config['SIGNED_FOLDER'], exist_ok=True)
     os.makedirs(app.config['SIGNATURES_FOLDER'], exist_ok=True)
 
+# Helper: Path for a new file in one of 256 subfolders of folder (by key, e.g. a
+# user or document id), so no single directory grows without bound. Existing
+# records keep their stored paths
+def sharded_path(folder, key, filename):
+    subfolder = os.path.join(folder, f"{key % 256:02x}")
+    os.makedirs(subfolder, exist_ok=True)
+    return os.path.join(subfolder, filename)
+
 # Helper: Check allowed file extensions
 def allowed_file(filename, allowed_extensions):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+    # Needs a name before the dot, so a bare ".pdf" is rejected
+    dot = filename.rfind('.')
+    return dot > 0 and filename[dot + 1:].lower() in allowed_extensions
+
+# Helper: Save an uploaded file, moving it into place if it was spooled to disk
+def save_upload(file, filepath):
+    stream = file.stream
+    if stream in g.get('spooled_uploads', ()):
+        stream.close()
+        os.replace(stream.name, filepath)
+    else:
+        file.save(filepath)
+
+# Helper: Parse a multipart body straight from request.stream with streaming-form-data.
+# The file part goes to file_target; returns (client filename or None, {field: value})
+def parse_multipart(file_field, file_target, value_fields):
+    parser = StreamingFormDataParser(headers=request.headers)
+    parser.register(file_field, file_target)
+    values = {name: ValueTarget() for name in value_fields}
+    for name, target in values.items():
+        parser.register(name, target)
+
+    while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+        parser.data_received(chunk)
+
+    form = {name: target.value.decode() for name, target in values.items() if target.value}
+    return file_target.multipart_filename, form
+
+# Helper: Stream a raw request body to disk in fixed-size chunks
+def stream_to_file(stream, filepath):
+    with open(filepath, 'wb') as f:
+        shutil.copyfileobj(stream, f, UPLOAD_CHUNK_SIZE)
+
+# Helper: Delete a file if present (single syscall, no exists() check first)
+def remove_file(path):
+    with suppress(FileNotFoundError):
+        os.remove(path)
+
+# Remove spooled uploads that were never moved into place
+@app.teardown_request
+def discard_spooled_uploads(exc):
+    for spooled in g.pop('spooled_uploads', ()):
+        spooled.close()
+        remove_file(spooled.name)
+
+# Helper: Current user's signature, looked up once per request
+def get_current_signature():
+    if 'signature' not in g:
+        g.signature = db.session.scalar(
+            db.select(Signature).filter_by(user_id=current_user.id).limit(1)
+        )
+    return g.signature
+
+# Helper: Process, encrypt and store a user's signature image, replacing any previous one
+def store_signature(user_id, image_data, original_filename, signer_name):
+    # Process signature (remove background, optimize)
+    processed_signature = process_signature_image(image_data)
+
+    # Generate unique filename
+    filename = f"{user_id}_{secrets.token_urlsafe(16)}.enc"
+    encrypted_path = sharded_path(app.config['SIGNATURES_FOLDER'], user_id, filename)
+
+    # Encrypt and save (hash computed from the same buffer for integrity)
+    encryption = get_encryption()
+    file_hash = encryption.encrypt_to_file(processed_signature, encrypted_path)
+
+    # Check for existing signature and update or create
+    existing_signature = db.session.scalar(db.select(Signature).filter_by(user_id=user_id).limit(1))
+
+    old_path = None
+    if existing_signature:
+        old_path = existing_signature.encrypted_path
+        # Update existing record
+        existing_signature.encrypted_path = encrypted_path
+        existing_signature.original_filename = original_filename
+        existing_signature.file_hash = file_hash
+        existing_signature.signer_name = signer_name
+        existing_signature.updated_at = datetime.utcnow()
+        signature = existing_signature
+    else:
+        # Create new signature record
+        signature = Signature(
+            user_id=user_id,
+            encrypted_path=encrypted_path,
+            original_filename=original_filename,
+            file_hash=file_hash,
+            signer_name=signer_name
+        )
+        db.session.add(signature)
+
+    db.session.commit()
+    evict_signature_data(user_id)
+
+    # Delete old encrypted file only once the record points at the new one
+    if old_path:
+        remove_file(old_path)
+    return signature
+
+# Background jobs (?async=1) run on this process's executor and keep their status in
+# the jobs table, so a poll answered by another worker process still finds them.
+# The executor is created on first use so importing the app starts no threads
+job_executor = None
+job_executor_lock = threading.Lock()
+
+# Helper: Record a background job's status (and result) in its own transaction
+def set_job_status(job_id, status, result=None):
+    Job.query.filter_by(id=job_id).update({'status': status, 'result': result})
+    db.session.commit()
+
+# Helper: Run func(*args) in an app context on the background executor, returns the job id.
+# func returns the JSON fields reported when the job finishes
+def submit_job(user_id, error_message, func, *args):
+    global job_executor
+    with job_executor_lock:
+        if job_executor is None:
+            job_executor = ThreadPoolExecutor(
+                max_workers=app.config['JOB_WORKERS'], thread_name_prefix='background-job'
+            )
+
+    # Forget jobs past JOB_TTL: reported ones nobody fetched, and ones whose
+    # worker process was stopped before they finished
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['JOB_TTL'])
+    Job.query.filter(Job.created_at < cutoff).delete(synchronize_session=False)
+
+    job_id = secrets.token_urlsafe(16)
+    db.session.add(Job(id=job_id, user_id=user_id, worker=f"{socket.gethostname()}:{os.getpid()}"))
+    db.session.commit()
+
+    def run():
+        with app.app_context():
+            set_job_status(job_id, 'running')
+            try:
+                result = func(*args)
+            except Exception as e:
+                db.session.rollback()
+                set_job_status(job_id, 'failed', {'error': f"{error_message}: {str(e)}"})
+            else:
+                set_job_status(job_id, 'finished', result)
+
+    job_executor.submit(run)
+    return job_id
+
+# Bulk signing and detection share one process pool per app process, created on
+# first use. Its workers come from a forkserver (spawn where there is none, e.g.
+# Windows): forking a gunicorn worker that has other threads running can copy
+# held SQLAlchemy/logging locks into the child
+process_pool = None
+process_pool_lock = threading.Lock()
+
+# Helper: Multiprocessing context for the process pool, never plain fork
+def process_pool_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Workers start from a server that already imported the PDF code
+        context.set_forkserver_preload(['pdf_signer', 'signature_detector'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+# Helper: Submit fn(*args, **kwargs) to the shared process pool, replacing the pool
+# if a worker died (a broken pool refuses every later task)
+def submit_to_process_pool(fn, *args, **kwargs):
+    global process_pool
+    with process_pool_lock:
+        for _ in range(2):
+            if process_pool is None:
+                process_pool = ProcessPoolExecutor(
+                    max_workers=app.config['PROCESS_WORKERS'], mp_context=process_pool_context()
+                )
+            try:
+                return process_pool.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                process_pool.shutdown(wait=False)
+                process_pool = None
+        raise BrokenProcessPool('Process pool could not be restarted')
+
+# Helper: Whether the process with this pid (on this host) is still running.
+# Other processes are only looked for on POSIX; on Windows the app runs as one process
+def process_running(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Helper: Fail background jobs left queued or running by a stopped process on this
+# host, e.g. a restarted worker (run at startup; get_job covers other hosts after JOB_TTL)
+def fail_interrupted_jobs():
+    host = socket.gethostname()
+    unfinished = db.session.execute(
+        db.select(Job.id, Job.worker).where(Job.status.in_(('queued', 'running')))
+    ).all()
+    job_ids = []
+    for job_id, worker in unfinished:
+        worker_host, _, pid = (worker or '').rpartition(':')
+        if worker_host == host and pid.isdigit() and not process_running(int(pid)):
+            job_ids.append(job_id)
+    if not job_ids:
+        return
+    Job.query.filter(Job.id.in_(job_ids), Job.status.in_(('queued', 'running'))).update(
+        {'status': 'failed', 'result': {'error': 'Job was interrupted'}}, synchronize_session=False
+    )
+    db.session.commit()
+
+# Helper: Background version of a signature upload
+def store_signature_job(user_id, image_data, original_filename, signer_name):
+    signature = store_signature(user_id, image_data, original_filename, signer_name)
+    return {
+        'message': 'Signature uploaded and processed successfully',
+        'signature': signature.to_dict()
+    }
+
+# Decrypted, integrity-checked signatures: user_id -> (file_hash, bytes, image),
+# least recently used first. One entry per user, dropped when the signature is
+# replaced or deleted so old plaintext doesn't linger in memory
+SIGNATURE_CACHE_SIZE = 128
+signature_cache = OrderedDict()
+signature_cache_lock = threading.Lock()
+
+# Helper: Decrypted signature bytes and their ready-to-draw image, from the cache
+# or decrypted, verified and decoded once
+def load_signature(user_id, file_hash, encrypted_path):
+    with signature_cache_lock:
+        cached = signature_cache.get(user_id)
+        if cached and cached[0] == file_hash:
+            signature_cache.move_to_end(user_id)
+            return cached[1], cached[2]
+
+    encryption = get_encryption()
+    data = encryption.decrypt_file(encrypted_path)
+    if not encryption.verify_integrity(data, file_hash):
+        raise SignatureIntegrityError('Signature integrity check failed')
+    image = load_signature_image(data)
+
+    with signature_cache_lock:
+        signature_cache[user_id] = (file_hash, data, image)
+        signature_cache.move_to_end(user_id)
+        while len(signature_cache) > SIGNATURE_CACHE_SIZE:
+            signature_cache.popitem(last=False)
+    return data, image
+
+# Helper: Decrypted signature bytes only (see load_signature)
+def load_signature_data(user_id, file_hash, encrypted_path):
+    return load_signature(user_id, file_hash, encrypted_path)[0]
+
+# Helper: Forget a user's cached signature (after it is replaced or deleted)
+def evict_signature_data(user_id):
+    with signature_cache_lock:
+        signature_cache.pop(user_id, None)
+
+# Helper: Return documents whose signing claim is older than SIGNING_CLAIM_TIMEOUT to
+# 'pending'. Claims are normally released by the request or job that made them; this
+# frees the ones left behind when a worker was killed or restarted mid-signing
+def release_stale_claims():
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['SIGNING_CLAIM_TIMEOUT'])
+    stale = db.or_(Document.claimed_at.is_(None), Document.claimed_at < cutoff)
+    # Plain SELECT first, so the common case takes no write lock
+    doc_ids = db.session.scalars(
+        db.select(Document.id).where(Document.status == 'signing', stale)
+    ).all()
+    if not doc_ids:
+        return
+    Document.query.filter(
+        Document.id.in_(doc_ids), Document.status == 'signing', stale
+    ).update({'status': 'pending', 'claimed_at': None}, synchronize_session=False)
+    db.session.commit()
+    invalidate_documents(*doc_ids)
+
+# Helper: Return a document claimed for signing to its previous status after a failure
+# (unless the claim was already given up, see release_stale_claims)
+def release_document(doc_id, previous_status, claimed_at, signed_path):
+    Document.query.filter(
+        Document.id == doc_id, Document.status == 'signing', Document.claimed_at == claimed_at
+    ).update({'status': previous_status, 'claimed_at': None}, synchronize_session=False)
+    db.session.commit()
+    remove_file(signed_path)
+
+# Helper: Render the signed PDF for a document claimed by sign_document and mark it
+# signed. On failure the claim is released and the error re-raised
+def complete_signing(doc_id, previous_status, claimed_at, signed_path, user_id, signer_name,
+                     signature_ref, position, positions, client_ip):
+    document = db.session.get(Document, doc_id)
+    try:
+        # Decrypt and verify signature
+        _, signature_data = load_signature(*signature_ref)
+
+        # F2F documents: use special signing with text box, last page only
+        if document.document_type == 'f2f':
+            # Use only the first position (should be last page from detection)
+            pos = positions[0] if positions else position
+            # Generate a unique document ID for the signature box
+            doc_uuid = str(uuid.uuid4())
+            add_f2f_signature_to_pdf(
+                pdf_path=document.original_path,
+                signature_data=signature_data,
+                position=pos,
+                output_path=signed_path,
+                signer_name=signer_name,
+                document_id=doc_uuid,
+                ip_address=client_ip
+            )
+            num_signatures = 1
+        elif positions and len(positions) > 0:
+            # Multiple positions - use add_multiple_signatures
+            signatures_list = [
+                {'signature_data': signature_data, 'position': pos}
+                for pos in positions
+            ]
+            add_multiple_signatures(
+                pdf_path=document.original_path,
+                signatures=signatures_list,
+                output_path=signed_path,
+                signer_name=signer_name
+            )
+            num_signatures = len(positions)
+        else:
+            # Single position - use add_signature_to_pdf
+            add_signature_to_pdf(
+                pdf_path=document.original_path,
+                signature_data=signature_data,
+                position=position,
+                output_path=signed_path,
+                signer_name=signer_name
+            )
+            num_signatures = 1
+
+        # Update document record, only if this request still holds the claim
+        signed = Document.query.filter(
+            Document.id == doc_id, Document.status == 'signing', Document.claimed_at == claimed_at
+        ).update({
+            'signed_path': signed_path,
+            'signed_by': user_id,
+            'signed_at': datetime.utcnow(),
+            'signature_position': positions if positions else position,
+            'status': 'signed',
+            'claimed_at': None
+        }, synchronize_session=False)
+        if not signed:
+            raise RuntimeError('Signing took too long and the document was released')
+
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        release_document(doc_id, previous_status, claimed_at, signed_path)
+        raise
+
+    invalidate_documents(doc_id)
+    document = db.session.get(Document, doc_id, options=DOCUMENT_USERS, populate_existing=True)
+    return {
+        'message': f'Document signed successfully with {num_signatures} signature(s)',
+        'document': document.to_dict(),
+        'num_signatures': num_signatures,
+        'is_f2f': document.document_type == 'f2f'
+    }
+
+# Helper: Ask the kernel to start reading files now so their disk reads overlap
+def prefetch_files(paths):
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for path in paths:
+        with suppress(OSError):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+
+# Helper: SHA-256 of a file's contents, or None if it can't be read
+def file_digest(path):
+    try:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256()
+            while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+            return digest.digest()
+    except OSError:
+        return None
+
+# Helper: Detect signature positions for several documents, in parallel processes
+# (F2F documents only get a signature on the last page)
+def detect_documents(documents):
+    prefetch_files(document.original_path for document in documents)
+
+    # The same PDF uploaded more than once is only detected once per detector.
+    # Only files whose sizes collide can be duplicates, so only those are hashed
+    sizes = {}
+    for document in documents:
+        with suppress(OSError):
+            sizes[document.original_path] = os.stat(document.original_path).st_size
+    size_counts = Counter(sizes.values())
+
+    keys = []
+    jobs = {}
+    for document in documents:
+        detect = detect_f2f_signature_position if document.document_type == 'f2f' else detect_all_signature_positions
+        digest = None
+        if size_counts[sizes.get(document.original_path)] > 1:
+            digest = file_digest(document.original_path)
+        key = (detect, digest or document.original_path)
+        keys.append(key)
+        jobs.setdefault(key, document.original_path)
+
+    # Results this process has cached already (see cached_by_file); the rest are
+    # detected in worker processes and cached here, since the workers' caches
+    # don't outlive the pool
+    results = {}
+    for key, pdf_path in jobs.items():
+        cached = key[0].cached(pdf_path)
+        if cached is not None:
+            results[key] = cached
+    pending = {key: pdf_path for key, pdf_path in jobs.items() if key not in results}
+
+    if min(len(pending), app.config['PROCESS_WORKERS']) > 1:
+        futures = {key: submit_to_process_pool(key[0], pdf_path) for key, pdf_path in pending.items()}
+        for key, future in futures.items():
+            results[key] = future.result()
+            key[0].remember(pending[key], results[key])
+    else:
+        for key, pdf_path in pending.items():
+            results[key] = key[0](pdf_path)
+
+    # Each document gets its own copy (positions end up in its own row)
+    return [copy.deepcopy(results[key]) for key in keys]
+
+# Helper: Send a stored PDF, handing the transfer to nginx when X-Accel-Redirect is configured
+def send_stored_file(path, **kwargs):
+    response = send_file(path, **kwargs)
+    prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+    if not prefix or response.status_code >= 300:
+        return response
+
+    # nginx streams the file itself and keeps our Content-Type/Disposition
+    # and Cache-Control headers; the app only sends headers
+    root = os.path.dirname(os.path.abspath(app.config['UPLOAD_FOLDER']))
+    relative = os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/')
+    response.close()
+    response.response = []
+    response.headers.pop('X-Sendfile', None)
+    response.headers['Content-Length'] = '0'
+    response.headers['X-Accel-Redirect'] = f"{prefix}/{relative}"
+    return response
 
 # Helper: Role required decorator
 def role_required(role):
@@ -118,7 +696,13 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'error': 'Invalid email or password'}), 401
 
+    # Upgrade legacy password hashes while the plain password is at hand
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
+
     login_user(user)
+    user_cache.pop(user.id, None)  # Start the new session from fresh user data
     return jsonify({'message': 'Login successful', 'user': user.to_dict()}), 200
 
 
@@ -126,6 +710,7 @@ def login():
 @login_required
 def logout():
     """Logout user."""
+    user_cache.pop(current_user.id, None)
     logout_user()
     return jsonify({'message': 'Logout successful'}), 200
 
@@ -148,79 +733,53 @@ def upload_signature():
     - Encrypts and stores securely
     - Optionally stores signer name for "Digitally signed by" text
     """
-    if 'signature' not in request.files:
-        return jsonify({'error': 'No signature file provided'}), 400
-
-    file = request.files['signature']
-    if file.filename == '':
+    if HAS_STREAMING_FORM_DATA and request.mimetype == 'multipart/form-data':
+        # Parse the body directly, collecting the image in memory
+        image_target = ValueTarget()
+        source_filename, form = parse_multipart('signature', image_target, ('signer_name',))
+        if source_filename is None:
+            return jsonify({'error': 'No signature file provided'}), 400
+        image_data = image_target.value
+    else:
+        if 'signature' not in request.files:
+            return jsonify({'error': 'No signature file provided'}), 400
+        file = request.files['signature']
+        source_filename = file.filename
+        form = request.form
+        # Decode straight from the upload stream instead of copying it into memory
+        image_data = file.stream
+
+    if source_filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
-    if not allowed_file(file.filename, app.config['ALLOWED_IMAGE_EXTENSIONS']):
+    if not allowed_file(source_filename, app.config['ALLOWED_IMAGE_EXTENSIONS']):
         return jsonify({'error': 'Invalid file type. Use PNG, JPG, or WEBP'}), 400
 
     # Get signer name from form data (optional, defaults to user's name)
-    signer_name = request.form.get('signer_name', '').strip()
+    signer_name = form.get('signer_name', '').strip()
     if not signer_name:
         signer_name = current_user.name  # Default to user's name
 
-    # Read file data
-    image_data = file.read()
+    original_filename = secure_filename(source_filename)
 
     # Validate image
     is_valid, error_msg = validate_image(image_data)
     if not is_valid:
         return jsonify({'error': error_msg}), 400
 
-    try:
-        # Process signature (remove background, optimize)
-        processed_signature = process_signature_image(image_data)
-
-        # Generate unique filename
-        filename = f"{current_user.id}_{uuid.uuid4().hex}.enc"
-        encrypted_path = os.path.join(app.config['SIGNATURES_FOLDER'], filename)
-
-        # Encrypt and save
-        encryption = get_encryption()
-        file_hash = encryption.encrypt_file(
-            input_path=None,  # We'll pass data directly
-            output_path=encrypted_path
-        ) if False else None
-
-        # Actually encrypt from memory
-        encrypted_data = encryption.encrypt(processed_signature)
-        with open(encrypted_path, 'wb') as f:
-            f.write(encrypted_data)
-
-        # Calculate hash for integrity
-        import hashlib
-        file_hash = hashlib.sha256(processed_signature).hexdigest()
-
-        # Check for existing signature and update or create
-        existing_signature = Signature.query.filter_by(user_id=current_user.id).first()
-
-        if existing_signature:
-            # Delete old encrypted file
-            if os.path.exists(existing_signature.encrypted_path):
-                os.remove(existing_signature.encrypted_path)
-            # Update existing record
-            existing_signature.encrypted_path = encrypted_path
-            existing_signature.original_filename = secure_filename(file.filename)
-            existing_signature.file_hash = file_hash
-            existing_signature.signer_name = signer_name
-            existing_signature.updated_at = datetime.utcnow()
-            signature = existing_signature
-        else:
-            # Create new signature record
-            signature = Signature(
-                user_id=current_user.id,
-                encrypted_path=encrypted_path,
-                original_filename=secure_filename(file.filename),
-                file_hash=file_hash,
-                signer_name=signer_name
-            )
-            db.session.add(signature)
+    # ?async=1: process in the background and let the client poll the job
+    if request.args.get('async', type=int):
+        if not isinstance(image_data, bytes):
+            image_data.seek(0)
+            image_data = image_data.read()  # The upload stream closes with the request
+        job_id = submit_job(
+            current_user.id, 'Failed to process signature',
+            store_signature_job, current_user.id, image_data, original_filename, signer_name
+        )
+        return jsonify({'job_id': job_id, 'status': 'queued'}), 202
 
-        db.session.commit()
+    try:
+        signature = store_signature(current_user.id, image_data, original_filename, signer_name)
 
         return jsonify({
             'message': 'Signature uploaded and processed successfully',
@@ -232,31 +791,70 @@ def upload_signature():
         return jsonify({'error': f'Failed to process signature: {str(e)}'}), 500
 
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@app.route('/api/signatures/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """
+    Status of a background signature upload or document signing (?async=1).
+    Finished and failed jobs are forgotten once reported.
+    """
+    job = db.session.get(Job, job_id)
+    if not job or job.user_id != current_user.id:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job.status in ('queued', 'running'):
+        cutoff = datetime.utcnow() - timedelta(seconds=app.config['JOB_TTL'])
+        if job.created_at >= cutoff:
+            return jsonify({'job_id': job_id, 'status': job.status}), 200
+        # Its worker process was stopped before the job finished
+        job.status = 'failed'
+        job.result = {'error': 'Job was interrupted'}
+
+    response = {'job_id': job_id, 'status': job.status, **(job.result or {})}
+    db.session.delete(job)
+    db.session.commit()
+    return jsonify(response), 200
+
+
+@app.route('/api/signatures/info', methods=['GET'])
+@login_required
+def get_signature_info():
+    """Get details of user's saved signature."""
+    signature = get_current_signature()
+
+    if not signature:
+        return jsonify({'error': 'No signature found'}), 404
+
+    return jsonify({'info': signature.to_dict()}), 200
+
+
 @app.route('/api/signatures/preview', methods=['GET'])
 @login_required
 def get_signature_preview_route():
-    """Get preview of user's saved signature."""
-    signature = Signature.query.filter_by(user_id=current_user.id).first()
+    """Get preview of user's saved signature as a PNG image."""
+    signature = get_current_signature()
 
     if not signature:
         return jsonify({'error': 'No signature found'}), 404
 
+    # The stored hash identifies the image, so a matching If-None-Match
+    # skips decryption entirely
+    etag = signature.file_hash
+    if etag in request.if_none_match:
+        return '', 304
+
     try:
-        encryption = get_encryption()
-        decrypted_data = encryption.decrypt_file(signature.encrypted_path)
+        decrypted_data = load_signature_data(signature.user_id, signature.file_hash, signature.encrypted_path)
 
-        # Verify integrity
-        import hashlib
-        if hashlib.sha256(decrypted_data).hexdigest() != signature.file_hash:
-            return jsonify({'error': 'Signature integrity check failed'}), 500
-
-        # Return as base64 for preview
-        base64_data = base64.b64encode(decrypted_data).decode()
-        return jsonify({
-            'signature': f'data:image/png;base64,{base64_data}',
-            'info': signature.to_dict()
-        }), 200
+        response = send_file(io.BytesIO(decrypted_data), mimetype='image/png', etag=etag)
+        # Private, and revalidated on every use so a new upload shows immediately
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
 
+    except SignatureIntegrityError as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve signature: {str(e)}'}), 500
 
@@ -265,18 +863,20 @@ def get_signature_preview_route():
 @login_required
 def delete_signature():
     """Delete user's saved signature."""
-    signature = Signature.query.filter_by(user_id=current_user.id).first()
+    signature = get_current_signature()
 
     if not signature:
         return jsonify({'error': 'No signature found'}), 404
 
     try:
-        # Delete encrypted file
-        if os.path.exists(signature.encrypted_path):
-            os.remove(signature.encrypted_path)
-
+        encrypted_path = signature.encrypted_path
         db.session.delete(signature)
         db.session.commit()
+        evict_signature_data(current_user.id)
+
+        # Delete encrypted file after the record is gone, so a failed commit
+        # never leaves a row pointing at a missing file
+        remove_file(encrypted_path)
 
         return jsonify({'message': 'Signature deleted successfully'}), 200
 
@@ -291,28 +891,63 @@ def delete_signature():
 @login_required
 @role_required('admin')
 def upload_document():
-    """Upload a PDF document (admin only)."""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+    """
+    Upload a PDF document (admin only).
+    Accepts multipart form data, or a raw application/octet-stream body with
+    the filename in the X-Filename header and metadata in the query string.
+    """
+    streamed = request.mimetype == 'application/octet-stream'
+    spooled_path = None
+
+    if streamed:
+        source_filename = request.headers.get('X-Filename') or request.args.get('filename', '')
+        metadata = request.args
+    elif HAS_STREAMING_FORM_DATA and request.mimetype == 'multipart/form-data':
+        # Parse the body directly, writing the PDF part into the upload folder
+        spooled = spool_upload()
+        spooled.close()
+        spooled_path = spooled.name
+        source_filename, metadata = parse_multipart(
+            'file', FileTarget(spooled_path), ('document_type', 'patient_name', 'patient_id')
+        )
+        if source_filename is None:
+            return jsonify({'error': 'No file provided'}), 400
+    else:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        file = request.files['file']
+        source_filename = file.filename
+        metadata = request.form
 
-    file = request.files['file']
-    if file.filename == '':
+    if source_filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
-    if not allowed_file(file.filename, app.config['ALLOWED_PDF_EXTENSIONS']):
+    if not allowed_file(source_filename, app.config['ALLOWED_PDF_EXTENSIONS']):
         return jsonify({'error': 'Only PDF files are allowed'}), 400
 
     # Get metadata
-    document_type = request.form.get('document_type', 'general')
-    patient_name = request.form.get('patient_name', '')
-    patient_id = request.form.get('patient_id', '')
+    document_type = metadata.get('document_type', 'general')
+    patient_name = metadata.get('patient_name', '')
+    patient_id = metadata.get('patient_id', '')
 
     # Save file
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    original_filename = secure_filename(file.filename)
-    filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{original_filename}"
+    original_filename = secure_filename(source_filename)
+    filename = f"{timestamp}_{secrets.token_urlsafe(6)}_{original_filename}"
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
+    if streamed:
+        stream_to_file(request.stream, filepath)
+    elif spooled_path:
+        os.replace(spooled_path, filepath)
+    else:
+        save_upload(file, filepath)
+
+    # Get PDF info once; it is stored with the document for later requests
+    try:
+        pdf_info = get_pdf_info(filepath)
+    except Exception as e:
+        remove_file(filepath)
+        return jsonify({'error': f'Invalid PDF file: {str(e)}'}), 400
 
     # Create document record
     document = Document(
@@ -322,14 +957,14 @@ def upload_document():
         patient_name=patient_name,
         patient_id=patient_id,
         uploaded_by=current_user.id,
-        status='pending'
+        status='pending',
+        pdf_info=pdf_info
     )
 
     db.session.add(document)
     db.session.commit()
-
-    # Get PDF info
-    pdf_info = get_pdf_info(filepath)
+    invalidate_documents()
+    document = db.session.get(Document, document.id, options=DOCUMENT_USERS, populate_existing=True)
 
     return jsonify({
         'message': 'Document uploaded successfully',
@@ -344,34 +979,90 @@ def get_documents():
     """Get documents based on status filter."""
     status = request.args.get('status', 'pending')
 
-    if current_user.role == 'admin':
-        documents = Document.query.filter_by(status=status).all()
-    else:
-        # Doctors see pending documents
-        documents = Document.query.filter_by(status=status).all()
-
-    return jsonify([doc.to_dict() for doc in documents]), 200
+    # Optional pagination (per_page capped at 200):
+    #   ?page=2&per_page=50      offset pages
+    #   ?after=<id>&per_page=50  documents after the last id already seen
+    page = request.args.get('page', type=int)
+    per_page = request.args.get('per_page', type=int)
+    after = request.args.get('after', type=int)
+    if page or per_page or after is not None:
+        page = max(page or 1, 1)
+        per_page = min(max(per_page or 50, 1), 200)
+
+    return jsonify(list_documents(status, page, per_page, after)), 200
+
+
+# Helper: Serialized document list, cached until documents change (see invalidate_documents)
+@cache.memoize()
+def list_documents(status, page=None, per_page=None, after=None):
+    # Admins and doctors see the same status-filtered list; only the columns
+    # used by to_dict() are loaded (skips paths and signature_position JSON).
+    # Uploader and signer names come from one extra IN query each (they are
+    # never lazy loaded).
+    query = Document.query.filter_by(status=status).options(
+        load_only(
+            Document.id, Document.filename, Document.document_type,
+            Document.patient_name, Document.patient_id, Document.uploaded_by,
+            Document.uploaded_at, Document.signed_by, Document.signed_at,
+            Document.status
+        ),
+        selectinload(Document.uploader).options(*USER_NAME_ONLY),
+        selectinload(Document.signer).options(*USER_NAME_ONLY),
+    ).order_by(Document.id)
+
+    if after is not None:
+        # Seek straight to the next id in the (status, id) index instead of
+        # skipping over an offset, so late pages cost the same as the first
+        query = query.filter(Document.id > after).limit(per_page)
+    elif per_page:
+        query = query.limit(per_page).offset((page - 1) * per_page)
+
+    return [doc.to_dict() for doc in query.all()]
 
 
 @app.route('/api/documents/<int:doc_id>', methods=['GET'])
 @login_required
 def get_document(doc_id):
     """Get document details."""
-    document = Document.query.get_or_404(doc_id)
-    pdf_info = get_pdf_info(document.original_path)
+    return jsonify(document_details(doc_id)), 200
 
-    return jsonify({
+
+# Helper: Serialized document details with PDF info, cached until the document changes
+@cache.memoize()
+def document_details(doc_id):
+    # Uploader and signer names are joined into the same SELECT
+    document = db.get_or_404(Document, doc_id, options=DOCUMENT_USERS)
+    details = {
         'document': document.to_dict(),
-        'pdf_info': pdf_info
-    }), 200
+        'pdf_info': document.pdf_info
+    }
+
+    # Documents uploaded before pdf_info was stored get it filled in on first view
+    if details['pdf_info'] is None:
+        details['pdf_info'] = document.pdf_info = get_pdf_info(document.original_path)
+        db.session.commit()
+
+    return details
+
+
+# Helper: Drop cached listings (and details of the given documents) after a change
+def invalidate_documents(*doc_ids):
+    cache.delete_memoized(list_documents)
+    for doc_id in doc_ids:
+        cache.delete_memoized(document_details, doc_id)
 
 
 @app.route('/api/documents/<int:doc_id>/file', methods=['GET'])
 @login_required
 def get_document_file(doc_id):
     """Serve the PDF file."""
-    document = Document.query.get_or_404(doc_id)
-    return send_file(document.original_path, mimetype='application/pdf')
+    document = db.get_or_404(Document, doc_id)
+    # Conditional responses let repeat previews revalidate (304) instead of
+    # re-sending the PDF; file paths go through wsgi.file_wrapper (sendfile),
+    # or X-Sendfile / X-Accel-Redirect when configured
+    response = send_stored_file(document.original_path, mimetype='application/pdf', conditional=True, etag=True)
+    response.cache_control.private = True
+    return response
 
 
 @app.route('/api/documents/<int:doc_id>/sign', methods=['POST'])
@@ -382,15 +1073,16 @@ def sign_document(doc_id):
     Supports both single position and multiple positions (one per page).
     F2F documents: only last page with text box.
     """
-    from pdf_signer import add_multiple_signatures
-
-    document = Document.query.get_or_404(doc_id)
+    release_stale_claims()
+    document = db.get_or_404(Document, doc_id)
 
     if document.status == 'signed':
         return jsonify({'error': 'Document already signed'}), 400
+    if document.status == 'signing':
+        return jsonify({'error': 'Document is already being signed'}), 409
 
     # Get user's signature
-    signature = Signature.query.filter_by(user_id=current_user.id).first()
+    signature = get_current_signature()
     if not signature:
         return jsonify({'error': 'No signature found. Please upload your signature first.'}), 400
 
@@ -402,105 +1094,71 @@ def sign_document(doc_id):
     if not position and not positions:
         return jsonify({'error': 'Signature position required'}), 400
 
-    try:
-        # Decrypt signature
-        encryption = get_encryption()
-        signature_data = encryption.decrypt_file(signature.encrypted_path)
-
-        # Verify integrity
-        import hashlib
-        if hashlib.sha256(signature_data).hexdigest() != signature.file_hash:
-            return jsonify({'error': 'Signature integrity check failed'}), 500
+    # Claim the document with a compare-and-swap on its status, so of several
+    # concurrent requests only one renders the signed PDF
+    previous_status = document.status
+    claimed_at = datetime.utcnow()
+    claimed = Document.query.filter(
+        Document.id == document.id, Document.status == previous_status
+    ).update({'status': 'signing', 'claimed_at': claimed_at})
+    db.session.commit()
+    if not claimed:
+        return jsonify({'error': 'Document is already being signed'}), 409
 
-        # Generate unique signed PDF filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        unique_id = uuid.uuid4().hex[:8]
-        signed_filename = f"signed_{timestamp}_{unique_id}_{document.filename}"
-        signed_path = os.path.join(app.config['SIGNED_FOLDER'], signed_filename)
+    # Generate unique signed PDF filename
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    unique_id = secrets.token_urlsafe(6)
+    signed_filename = f"signed_{timestamp}_{unique_id}_{document.filename}"
+    signed_path = sharded_path(app.config['SIGNED_FOLDER'], document.id, signed_filename)
 
+    sign_args = (
+        document.id, previous_status, claimed_at, signed_path, current_user.id,
         # Get signer name (fallback to user's name if not set)
-        signer_name = signature.signer_name or current_user.name
-
-        # F2F documents: use special signing with text box, last page only
-        if document.document_type == 'f2f':
-            # Use only the first position (should be last page from detection)
-            pos = positions[0] if positions else position
-            # Generate a unique document ID for the signature box
-            import uuid
-            doc_uuid = str(uuid.uuid4())
-            # Get client IP address
-            client_ip = request.remote_addr or request.headers.get('X-Forwarded-For', '::1')
-            add_f2f_signature_to_pdf(
-                pdf_path=document.original_path,
-                signature_data=signature_data,
-                position=pos,
-                output_path=signed_path,
-                signer_name=signer_name,
-                document_id=doc_uuid,
-                ip_address=client_ip
-            )
-            num_signatures = 1
-        elif positions and len(positions) > 0:
-            # Multiple positions - use add_multiple_signatures
-            signatures_list = [
-                {'signature_data': signature_data, 'position': pos}
-                for pos in positions
-            ]
-            add_multiple_signatures(
-                pdf_path=document.original_path,
-                signatures=signatures_list,
-                output_path=signed_path,
-                signer_name=signer_name
-            )
-            num_signatures = len(positions)
-        else:
-            # Single position - use add_signature_to_pdf
-            add_signature_to_pdf(
-                pdf_path=document.original_path,
-                signature_data=signature_data,
-                position=position,
-                output_path=signed_path,
-                signer_name=signer_name
-            )
-            num_signatures = 1
-
-        # Update document record
-        document.signed_path = signed_path
-        document.signed_by = current_user.id
-        document.signed_at = datetime.utcnow()
-        document.signature_position = positions if positions else position
-        document.status = 'signed'
-
-        db.session.commit()
+        signature.signer_name or current_user.name,
+        (signature.user_id, signature.file_hash, signature.encrypted_path),
+        position, positions,
+        request.remote_addr or request.headers.get('X-Forwarded-For', '::1')
+    )
 
-        return jsonify({
-            'message': f'Document signed successfully with {num_signatures} signature(s)',
-            'document': document.to_dict(),
-            'num_signatures': num_signatures,
-            'is_f2f': document.document_type == 'f2f'
-        }), 200
+    # ?async=1: render in the background and let the client poll the job
+    if request.args.get('async', type=int):
+        job_id = submit_job(current_user.id, 'Failed to sign document', complete_signing, *sign_args)
+        response = jsonify({'job_id': job_id, 'status': 'queued'})
+        response.headers['Location'] = f'/api/jobs/{job_id}'
+        return response, 202
 
+    try:
+        return jsonify(complete_signing(*sign_args)), 200
+    except SignatureIntegrityError as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
-        db.session.rollback()
-        import traceback
         traceback.print_exc()
         return jsonify({'error': f'Failed to sign document: {str(e)}'}), 500
 
-
 @app.route('/api/documents/<int:doc_id>/download', methods=['GET'])
 @login_required
 def download_signed_document(doc_id):
     """Download signed PDF."""
-    document = Document.query.get_or_404(doc_id)
+    document = db.get_or_404(Document, doc_id)
 
     if document.status != 'signed' or not document.signed_path:
         return jsonify({'error': 'Document not signed yet'}), 400
 
-    return send_file(
+    # Each signing writes a new file, so the content behind a path never changes
+    response = send_stored_file(
         document.signed_path,
+        mimetype='application/pdf',
         as_attachment=True,
-        download_name=f"signed_{document.filename}"
+        download_name=f"signed_{document.filename}",
+        conditional=True,
+        etag=True
     )
+    # Set here rather than through send_file(max_age=...), which also marks
+    # the response public and would let shared caches keep patient PDFs
+    response.cache_control.private = True
+    response.cache_control.no_cache = None
+    response.cache_control.max_age = app.config['SIGNED_DOWNLOAD_MAX_AGE']
+    return response
 
 
 @app.route('/api/documents/<int:doc_id>/delete', methods=['DELETE'])
@@ -508,17 +1166,17 @@ def download_signed_document(doc_id):
 @role_required('admin')
 def delete_document(doc_id):
     """Delete a document (admin only)."""
-    document = Document.query.get_or_404(doc_id)
+    document = db.get_or_404(Document, doc_id)
 
     try:
-        # Delete files
-        if os.path.exists(document.original_path):
-            os.remove(document.original_path)
-        if document.signed_path and os.path.exists(document.signed_path):
-            os.remove(document.signed_path)
-
+        paths = [document.original_path, document.signed_path]
         db.session.delete(document)
         db.session.commit()
+        invalidate_documents(doc_id)
+
+        # Delete files after the record is gone (see delete_signature)
+        for path in filter(None, paths):
+            remove_file(path)
 
         return jsonify({'message': 'Document deleted successfully'}), 200
 
@@ -537,7 +1195,7 @@ def detect_document_signature_position(doc_id):
     Returns all signature positions (at most one per page).
     For F2F documents: only returns position on last page.
     """
-    document = Document.query.get_or_404(doc_id)
+    document = db.get_or_404(Document, doc_id)
 
     try:
         # F2F documents: signature only on last page in blank space
@@ -564,23 +1222,26 @@ def bulk_detect_signature_positions():
     if not document_ids:
         return jsonify({'error': 'No document IDs provided'}), 400
 
+    # Load all requested pending documents in one query (skipping the JSON columns)
+    documents_by_id = {
+        document.id: document
+        for document in Document.query.filter(
+            Document.id.in_(document_ids), Document.status == 'pending'
+        ).options(load_only(
+            Document.id, Document.filename, Document.original_path,
+            Document.document_type, Document.patient_name
+        )).all()
+    }
+    documents = [documents_by_id[doc_id] for doc_id in document_ids if doc_id in documents_by_id]
+
     results = []
-    for doc_id in document_ids:
-        document = Document.query.get(doc_id)
-        if document and document.status == 'pending':
-            # F2F documents: signature only on last page
-            if document.document_type == 'f2f':
-                detection = detect_f2f_signature_position(document.original_path)
-                detection['is_f2f'] = True
-            else:
-                # Use multi-page detection
-                detection = detect_all_signature_positions(document.original_path)
-                detection['is_f2f'] = False
-            detection['document_id'] = doc_id
-            detection['filename'] = document.filename
-            detection['patient_name'] = document.patient_name
-            detection['document_type'] = document.document_type
-            results.append(detection)
+    for document, detection in zip(documents, detect_documents(documents)):
+        detection['is_f2f'] = document.document_type == 'f2f'
+        detection['document_id'] = document.id
+        detection['filename'] = document.filename
+        detection['patient_name'] = document.patient_name
+        detection['document_type'] = document.document_type
+        results.append(detection)
 
     return jsonify({'detections': results}), 200
 
@@ -602,8 +1263,6 @@ def bulk_sign_documents():
         "auto_mode": false  // If true, auto-detect ALL positions for docs without positions
     }
     """
-    from pdf_signer import add_multiple_signatures
-
     data = request.json
     documents_to_sign = data.get('documents', [])
     auto_mode = data.get('auto_mode', False)
@@ -612,33 +1271,76 @@ def bulk_sign_documents():
         return jsonify({'error': 'No documents provided'}), 400
 
     # Get user's signature
-    signature = Signature.query.filter_by(user_id=current_user.id).first()
+    signature = get_current_signature()
     if not signature:
         return jsonify({'error': 'No signature found. Please upload your signature first.'}), 400
 
     # Decrypt signature once for all documents
     try:
-        encryption = get_encryption()
-        signature_data = encryption.decrypt_file(signature.encrypted_path)
-
-        # Verify integrity
-        import hashlib
-        if hashlib.sha256(signature_data).hexdigest() != signature.file_hash:
-            return jsonify({'error': 'Signature integrity check failed'}), 500
+        signature_data, signature_image = load_signature(signature.user_id, signature.file_hash, signature.encrypted_path)
+    except SignatureIntegrityError as e:
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': f'Failed to load signature: {str(e)}'}), 500
 
+    # Claim all pending requested documents with one compare-and-swap UPDATE (as
+    # sign_document does for one), so no other request renders them meanwhile
+    release_stale_claims()
+    doc_ids = [doc_info.get('id') for doc_info in documents_to_sign]
+    claimed_at = datetime.utcnow()
+    Document.query.filter(
+        Document.id.in_(doc_ids), Document.status == 'pending'
+    ).update({'status': 'signing', 'claimed_at': claimed_at}, synchronize_session=False)
+    db.session.commit()
+
+    try:
+        return sign_claimed_documents(
+            documents_to_sign, auto_mode, doc_ids, claimed_at,
+            signature, signature_data, signature_image
+        )
+    finally:
+        # Return claimed documents that did not get signed
+        db.session.rollback()
+        Document.query.filter(
+            Document.id.in_(doc_ids), Document.status == 'signing', Document.claimed_at == claimed_at
+        ).update({'status': 'pending', 'claimed_at': None}, synchronize_session=False)
+        db.session.commit()
+
+# Helper: Validate, auto-detect, sign and record the documents bulk_sign_documents has
+# claimed (status 'signing' with the given claimed_at); returns the response
+def sign_claimed_documents(documents_to_sign, auto_mode, doc_ids, claimed_at,
+                           signature, signature_data, signature_image):
     results = {
         'successful': [],
         'failed': []
     }
 
+    # Load all requested documents in one query (skipping the JSON columns)
+    documents_by_id = {
+        document.id: document
+        for document in Document.query.filter(Document.id.in_(doc_ids)).options(load_only(
+            Document.id, Document.filename, Document.original_path,
+            Document.document_type, Document.status, Document.claimed_at
+        )).all()
+    }
+
+    # One signing time for the whole batch (shown on every signed PDF) and the
+    # shared prefix for this batch's signed filenames
+    signed_time = datetime.now()
+    timestamp = signed_time.strftime('%Y%m%d_%H%M%S')
+    batch_id = secrets.token_urlsafe(6)
+
+    # Documents that passed validation, with their requested positions
+    # (None = auto-detect)
+    candidates = []
+    queued_ids = set()
+
     for doc_info in documents_to_sign:
         doc_id = doc_info.get('id')
         positions = doc_info.get('positions', [])  # Array of positions
         position = doc_info.get('position')        # Single position (backward compat)
 
-        document = Document.query.get(doc_id)
+        document = documents_by_id.get(doc_id)
         if not document:
             results['failed'].append({
                 'id': doc_id,
@@ -646,7 +1348,7 @@ def bulk_sign_documents():
             })
             continue
 
-        if document.status == 'signed':
+        if document.status == 'signed' or document.id in queued_ids:
             results['failed'].append({
                 'id': doc_id,
                 'filename': document.filename,
@@ -654,31 +1356,19 @@ def bulk_sign_documents():
             })
             continue
 
-        # Check if F2F document
-        is_f2f = document.document_type == 'f2f'
-
-        # Auto-detect positions if not provided and auto_mode is on
-        if not positions and not position and auto_mode:
-            if is_f2f:
-                # F2F: use special detection (last page only)
-                detection = detect_f2f_signature_position(document.original_path)
-            else:
-                detection = detect_all_signature_positions(document.original_path)
-            if detection['found'] and detection['positions']:
-                positions = detection['positions']
-            else:
-                results['failed'].append({
-                    'id': doc_id,
-                    'filename': document.filename,
-                    'error': 'Could not detect signature positions'
-                })
-                continue
+        if document.status != 'signing' or document.claimed_at != claimed_at:
+            results['failed'].append({
+                'id': doc_id,
+                'filename': document.filename,
+                'error': 'Already being signed' if document.status == 'signing' else 'Document is not pending'
+            })
+            continue
 
         # Handle backward compatibility: single position
         if position and not positions:
             positions = [position]
 
-        if not positions:
+        if not positions and not auto_mode:
             results['failed'].append({
                 'id': doc_id,
                 'filename': document.filename,
@@ -686,79 +1376,134 @@ def bulk_sign_documents():
             })
             continue
 
-        try:
-            # Generate unique signed PDF filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_id = uuid.uuid4().hex[:8]
-            signed_filename = f"signed_{timestamp}_{unique_id}_{document.filename}"
-            signed_path = os.path.join(app.config['SIGNED_FOLDER'], signed_filename)
-
-            # Get signer name (fallback to user's name if not set)
-            signer_name = signature.signer_name or current_user.name
-
-            # F2F documents: use special signing with text box, last page only
-            if is_f2f:
-                doc_uuid = uuid.uuid4().hex
-                client_ip = request.remote_addr or request.headers.get('X-Forwarded-For', '::1')
-                add_f2f_signature_to_pdf(
-                    pdf_path=document.original_path,
-                    signature_data=signature_data,
-                    position=positions[0],  # F2F only uses first position (last page)
-                    output_path=signed_path,
-                    signer_name=signer_name,
-                    document_id=doc_uuid,
-                    ip_address=client_ip
-                )
-            elif len(positions) > 1:
-                # Multiple positions - use add_multiple_signatures
-                signatures_list = [
-                    {'signature_data': signature_data, 'position': pos}
-                    for pos in positions
-                ]
-                add_multiple_signatures(
-                    pdf_path=document.original_path,
-                    signatures=signatures_list,
-                    output_path=signed_path,
-                    signer_name=signer_name
-                )
-            else:
-                # Single position
-                add_signature_to_pdf(
-                    pdf_path=document.original_path,
-                    signature_data=signature_data,
-                    position=positions[0],
-                    output_path=signed_path,
-                    signer_name=signer_name
-                )
+        candidates.append((document, positions or None))
+        queued_ids.add(document.id)
 
-            # Update document record
-            document.signed_path = signed_path
-            document.signed_by = current_user.id
-            document.signed_at = datetime.utcnow()
-            document.signature_position = positions
-            document.status = 'signed'
+    # Auto-detect positions for all documents that need it in one batch
+    to_detect = [document for document, positions in candidates if positions is None]
+    detected = iter(detect_documents(to_detect)) if to_detect else iter(())
 
-            results['successful'].append({
-                'id': doc_id,
-                'filename': document.filename,
-                'num_signatures': 1 if is_f2f else len(positions),
-                'is_f2f': is_f2f
-            })
+    # Documents ready to sign, and the resulting record updates
+    # (applied as a single bulk UPDATE)
+    jobs = []
+    updates = []
 
-        except Exception as e:
+    for document, positions in candidates:
+        if positions is None:
+            detection = next(detected)
+            if not (detection['found'] and detection['positions']):
+                results['failed'].append({
+                    'id': document.id,
+                    'filename': document.filename,
+                    'error': 'Could not detect signature positions'
+                })
+                continue
+            positions = detection['positions']
+
+        # Generate unique signed PDF filename (batch prefix + per-document counter)
+        signed_filename = f"signed_{timestamp}_{batch_id}_{len(jobs):04d}_{document.filename}"
+        signed_path = sharded_path(app.config['SIGNED_FOLDER'], document.id, signed_filename)
+
+        jobs.append({
+            'document': document,
+            'positions': positions,
+            'is_f2f': document.document_type == 'f2f',
+            'signed_path': signed_path
+        })
+    # Get signer name (fallback to user's name if not set)
+    signer_name = signature.signer_name or current_user.name
+    client_ip = request.remote_addr or request.headers.get('X-Forwarded-For', '::1')
+
+    sign_kwargs = [
+        {
+            'pdf_path': job['document'].original_path,
+            'positions': job['positions'],
+            'output_path': job['signed_path'],
+            'signer_name': signer_name,
+            'is_f2f': job['is_f2f'],
+            'document_id': uuid.uuid4().hex if job['is_f2f'] else None,
+            'ip_address': client_ip,
+            'timestamp': signed_time
+        }
+        for job in jobs
+    ]
+
+    # Sign documents in parallel, one batch per pool worker so each batch
+    # decodes the signature PNG once (nothing decoded outlives the batch)
+    num_batches = min(len(jobs), app.config['PROCESS_WORKERS'])
+    if num_batches > 1:
+        batches = [sign_kwargs[i::num_batches] for i in range(num_batches)]
+        futures = [submit_to_process_pool(sign_pdfs, signature_data, batch) for batch in batches]
+        errors = [None] * len(sign_kwargs)
+        for i, (batch, future) in enumerate(zip(batches, futures)):
+            try:
+                errors[i::num_batches] = future.result()
+            except Exception as e:
+                errors[i::num_batches] = [e] * len(batch)
+    else:
+        errors = sign_pdfs(signature_image, sign_kwargs)
+
+    for job, error in zip(jobs, errors):
+        document = job['document']
+        positions = job['positions']
+
+        if error is not None:
             results['failed'].append({
-                'id': doc_id,
+                'id': document.id,
                 'filename': document.filename,
-                'error': str(e)
+                'error': str(error)
             })
+            continue
 
-    # Commit all changes
+        # Queue document record update (written in one batch below)
+        updates.append({
+            'id': document.id,
+            'signed_path': job['signed_path'],
+            'signed_by': current_user.id,
+            'signed_at': datetime.utcnow(),
+            'signature_position': positions,
+            'status': 'signed',
+            'claimed_at': None
+        })
+
+        results['successful'].append({
+            'id': document.id,
+            'filename': document.filename,
+            'num_signatures': 1 if job['is_f2f'] else len(positions),
+            'is_f2f': job['is_f2f']
+        })
+
+    # Commit all changes, only for documents this request still holds the claim on
     try:
+        if updates:
+            db.session.execute(
+                db.update(Document).where(Document.status == 'signing', Document.claimed_at == claimed_at),
+                updates,
+                execution_options={'synchronize_session': None}
+            )
         db.session.commit()
+        invalidate_documents(*(update['id'] for update in updates))
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
 
+    # Documents whose claim expired meanwhile were not updated: drop their files
+    if updates:
+        recorded = set(db.session.execute(
+            db.select(Document.id, Document.signed_path).where(Document.id.in_([update['id'] for update in updates]))
+        ).tuples())
+        lost = {update['id'] for update in updates if (update['id'], update['signed_path']) not in recorded}
+        for update in updates:
+            if update['id'] in lost:
+                remove_file(update['signed_path'])
+        for entry in [entry for entry in results['successful'] if entry['id'] in lost]:
+            results['successful'].remove(entry)
+            results['failed'].append({
+                'id': entry['id'],
+                'filename': entry['filename'],
+                'error': 'Signing took too long and the document was released'
+            })
+
     total_sigs = sum(r.get('num_signatures', 1) for r in results['successful'])
     return jsonify({
         'message': f'Signed {len(results["successful"])} documents with {total_sigs} total signature(s)',
@@ -797,6 +1542,8 @@ if __name__ == '__main__':
     with app.app_context():
         db.create_all()
         init_app_encryption()
+        release_stale_claims()
+        fail_interrupted_jobs()
 
         # Create default admin if not exists
         admin = User.query.filter_by(email='admin@example.com').first()
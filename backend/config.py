@@ -10,6 +10,18 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///medical_docs.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Check pooled connections before use and recycle them before server-side
+    # idle timeouts (e.g. MySQL wait_timeout) drop them
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 280)),
+    }
+    # Keep enough pooled connections for every request thread plus background
+    # jobs, so busy workers don't open and close overflow connections
+    # (in-memory SQLite uses a single static connection instead)
+    if SQLALCHEMY_DATABASE_URI not in ('sqlite://', 'sqlite:///:memory:'):
+        SQLALCHEMY_ENGINE_OPTIONS['pool_size'] = int(os.getenv('DB_POOL_SIZE', 10))
+        SQLALCHEMY_ENGINE_OPTIONS['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
 
     # File Storage
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
@@ -19,8 +31,40 @@ class Config:
     # Encryption key for signatures (32 bytes for AES-256)
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', None)
 
+    # Seconds a logged-in user's record is reused before it is read again
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+
+    # Cache for document listings/details (Flask-Caching). SimpleCache is per process;
+    # use RedisCache (CACHE_REDIS_URL) when running several worker processes
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 60))
+
+    # Let a fronting nginx/Apache send PDFs via X-Sendfile instead of the app
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'false').lower() in ('1', 'true', 'yes')
+    # Or let nginx send them via X-Accel-Redirect: internal location (e.g. /_protected/)
+    # aliased to the project root, so files resolve as <prefix>/uploads/<name>
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
+    # How long browsers may reuse a downloaded signed PDF without revalidating
+    SIGNED_DOWNLOAD_MAX_AGE = int(os.getenv('SIGNED_DOWNLOAD_MAX_AGE', 3600))
+
+    # Seconds a document may stay claimed for signing ('signing') before it is
+    # returned to 'pending', e.g. after its worker was killed mid-render
+    SIGNING_CLAIM_TIMEOUT = int(os.getenv('SIGNING_CLAIM_TIMEOUT', 600))
+
+    # Background threads for signature uploads and document signing made with ?async=1
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    # Seconds a background job's status is kept; unfinished jobs older than this
+    # are reported as failed (their worker process was stopped)
+    JOB_TTL = int(os.getenv('JOB_TTL', 3600))
+
+    # Size of each app process's shared worker pool for bulk signing and
+    # signature position detection (1 = do the work in the request thread)
+    PROCESS_WORKERS = int(os.getenv('PROCESS_WORKERS', os.cpu_count() or 1))
+
     # Max file sizes
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
 
-    ALLOWED_PDF_EXTENSIONS = {'pdf'}
-    ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
+    ALLOWED_PDF_EXTENSIONS = frozenset({'pdf'})
+    ALLOWED_IMAGE_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'webp'})
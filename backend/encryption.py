@@ -4,12 +4,77 @@ Uses AES-256-GCM for authenticated encryption.
 """
 
 import os
+import mmap
 import hashlib
 import base64
+import tempfile
+from contextlib import contextmanager, suppress
+from functools import lru_cache
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+# Use BLAKE3 for integrity hashes if available, fallback to SHA-256
+try:
+    from blake3 import blake3
+    HAS_BLAKE3 = True
+except ImportError:
+    HAS_BLAKE3 = False
+
+# Plaintext chunk size for streaming encryption
+CHUNK_SIZE = 64 * 1024
+
+# Stored hashes with this prefix are BLAKE3, unprefixed ones are SHA-256
+BLAKE3_PREFIX = 'blake3:'
+
+# Buffers at least this large are hashed with BLAKE3's multithreaded mode
+PARALLEL_HASH_MIN_SIZE = 1024 * 1024
+
+
+@lru_cache(maxsize=4)
+def _pbkdf2_key(passphrase: bytes, salt: bytes) -> bytes:
+    """PBKDF2 derivation, memoized so re-initializing with the same passphrase is free."""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=100000,
+    )
+    return kdf.derive(passphrase)
+
+
+@contextmanager
+def _atomic_open(path: str):
+    """
+    Open a temporary file next to path for writing. On success it is fsynced
+    and renamed over path, so readers never see a partially written file.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+    # Persist the rename itself (directories can't be opened on Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class SignatureIntegrityError(Exception):
+    """Decrypted data does not match its stored hash."""
+
 
 class SignatureEncryption:
     def __init__(self, key: bytes = None):
@@ -36,13 +101,7 @@ class SignatureEncryption:
         if salt is None:
             salt = b'medical_pdf_signer_salt'  # In production, use random salt and store it
 
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        return kdf.derive(passphrase)
+        return _pbkdf2_key(passphrase, salt)
 
     def encrypt(self, data: bytes) -> bytes:
         """
@@ -58,29 +117,51 @@ class SignatureEncryption:
         Decrypt data encrypted with AES-256-GCM.
         Expects: nonce (12 bytes) + ciphertext + tag
         """
-        nonce = encrypted_data[:12]
-        ciphertext = encrypted_data[12:]
-        return self.aesgcm.decrypt(nonce, ciphertext, None)
+        # Slice through a memoryview so the ciphertext isn't copied first
+        view = memoryview(encrypted_data)
+        return self.aesgcm.decrypt(view[:12], view[12:], None)
+
+    def _encrypt_chunks_to_file(self, chunks, output_path: str) -> str:
+        """
+        Hash and encrypt plaintext chunks (at most CHUNK_SIZE each) in one pass.
+        Ciphertext goes through one reused buffer straight to the file, in the
+        same nonce + ciphertext + tag format as encrypt(). The file appears at
+        output_path only once fully written.
+        """
+        file_hash = blake3() if HAS_BLAKE3 else hashlib.sha256()
+        nonce = os.urandom(12)  # GCM standard nonce size
+        encryptor = Cipher(algorithms.AES(self.key), modes.GCM(nonce)).encryptor()
+        # update_into needs room for one extra block
+        buffer = bytearray(CHUNK_SIZE + 15)
+        out = memoryview(buffer)
+
+        with _atomic_open(output_path) as f:
+            f.write(nonce)
+            for chunk in chunks:
+                file_hash.update(chunk)
+                f.write(out[:encryptor.update_into(chunk, buffer)])
+            f.write(encryptor.finalize() + encryptor.tag)
+
+        if HAS_BLAKE3:
+            return BLAKE3_PREFIX + file_hash.hexdigest()
+        return file_hash.hexdigest()
 
     def encrypt_file(self, input_path: str, output_path: str) -> str:
         """
         Encrypt a file and save to output path.
-        Returns the SHA-256 hash of the original file for integrity verification.
+        Returns the hash of the original file for integrity verification.
         """
         with open(input_path, 'rb') as f:
-            data = f.read()
-
-        # Calculate hash of original data
-        file_hash = hashlib.sha256(data).hexdigest()
-
-        # Encrypt
-        encrypted_data = self.encrypt(data)
+            return self._encrypt_chunks_to_file(iter(lambda: f.read(CHUNK_SIZE), b''), output_path)
 
-        # Save encrypted file
-        with open(output_path, 'wb') as f:
-            f.write(encrypted_data)
-
-        return file_hash
+    def encrypt_to_file(self, data: bytes, output_path: str) -> str:
+        """
+        Encrypt in-memory data and save to output path.
+        Returns the hash of the original data for integrity verification.
+        """
+        view = memoryview(data)
+        chunks = (view[offset:offset + CHUNK_SIZE] for offset in range(0, len(view), CHUNK_SIZE))
+        return self._encrypt_chunks_to_file(chunks, output_path)
 
     def decrypt_file(self, input_path: str, output_path: str = None) -> bytes:
         """
@@ -89,19 +170,33 @@ class SignatureEncryption:
         Returns decrypted data.
         """
         with open(input_path, 'rb') as f:
-            encrypted_data = f.read()
-
-        decrypted_data = self.decrypt(encrypted_data)
+            if os.fstat(f.fileno()).st_size == 0:
+                decrypted_data = self.decrypt(b'')  # mmap can't map empty files
+            else:
+                # Decrypt from a read-only mapping of the file instead of a copy
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if hasattr(mapped, 'madvise'):
+                        mapped.madvise(mmap.MADV_SEQUENTIAL)
+                    with memoryview(mapped) as view:
+                        decrypted_data = self.aesgcm.decrypt(view[:12], view[12:], None)
 
         if output_path:
-            with open(output_path, 'wb') as f:
+            with _atomic_open(output_path) as f:
                 f.write(decrypted_data)
 
         return decrypted_data
 
     def verify_integrity(self, decrypted_data: bytes, expected_hash: str) -> bool:
-        """Verify file integrity using SHA-256 hash."""
-        actual_hash = hashlib.sha256(decrypted_data).hexdigest()
+        """Verify file integrity using the BLAKE3 or SHA-256 hash it was stored with."""
+        # Both hashers release the GIL while hashing large buffers, so other
+        # requests keep running; no manual chunking needed
+        if expected_hash.startswith(BLAKE3_PREFIX):
+            if not HAS_BLAKE3:
+                return False
+            max_threads = blake3.AUTO if len(decrypted_data) >= PARALLEL_HASH_MIN_SIZE else 1
+            actual_hash = BLAKE3_PREFIX + blake3(decrypted_data, max_threads=max_threads).hexdigest()
+        else:
+            actual_hash = hashlib.sha256(decrypted_data).hexdigest()
         return actual_hash == expected_hash
 
     @staticmethod
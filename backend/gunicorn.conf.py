@@ -0,0 +1,50 @@
+"""
+Gunicorn settings for running the backend in production (Linux/macOS):
+
+    gunicorn -c gunicorn.conf.py
+
+Threaded workers let slow uploads, PDF signing and file downloads overlap
+instead of queueing behind each other; PDF rendering, image processing,
+hashing and AES-GCM release the GIL or run in process pools.
+"""
+import os
+import sys
+
+from config import Config
+
+# Every worker process must decrypt signatures stored by the others, so they
+# can't each fall back to a random key of their own
+if not Config.ENCRYPTION_KEY:
+    sys.exit('ENCRYPTION_KEY must be set (in .env or the environment) to run under gunicorn')
+
+# Caches that live inside one process; with these, other workers would keep
+# serving stale document listings after a change
+PROCESS_LOCAL_CACHES = {'SimpleCache', 'simple', 'flask_caching.backends.SimpleCache'}
+
+wsgi_app = 'app:app'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# 'gthread' by default; 'gevent' also works if gevent is installed.
+# One worker process unless a shared cache (e.g. RedisCache) is configured
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', 1 if Config.CACHE_TYPE in PROCESS_LOCAL_CACHES else 2))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Bulk signing of many documents can take a while
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# Hold idle client connections open so the PDF viewer's repeated requests
+# reuse them (use a longer keep-alive on nginx in front)
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+
+def post_worker_init(worker):
+    """Per-worker setup that `python app.py` does in its __main__ block."""
+    from app import app, db, create_directories, init_app_encryption, release_stale_claims, fail_interrupted_jobs
+
+    create_directories()
+    with app.app_context():
+        db.create_all()
+        init_app_encryption()
+        release_stale_claims()
+        fail_interrupted_jobs()
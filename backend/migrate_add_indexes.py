@@ -0,0 +1,35 @@
+"""
+Migration script to add query indexes to an existing database.
+Run this once to update existing database (new databases get them from db.create_all()).
+"""
+import sqlite3
+import os
+
+DB_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'medical_docs.db')
+
+INDEXES = [
+    ('ix_documents_status_id', 'CREATE INDEX IF NOT EXISTS ix_documents_status_id ON documents (status, id)'),
+    ('ix_documents_uploaded_by', 'CREATE INDEX IF NOT EXISTS ix_documents_uploaded_by ON documents (uploaded_by)'),
+    ('ix_documents_signed_by', 'CREATE INDEX IF NOT EXISTS ix_documents_signed_by ON documents (signed_by)'),
+]
+
+def migrate():
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        for name, statement in INDEXES:
+            cursor.execute(statement)
+            print(f"Index '{name}' is in place.")
+        conn.commit()
+    except Exception as e:
+        print(f"Migration failed: {e}")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
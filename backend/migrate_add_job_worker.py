@@ -0,0 +1,38 @@
+"""
+Migration script to add worker column to jobs table.
+Run this once to update existing database.
+"""
+import sqlite3
+import os
+
+DB_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'medical_docs.db')
+
+def migrate():
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Check if column already exists (no jobs table yet: the app creates it with the column)
+    cursor.execute("PRAGMA table_info(jobs)")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if not columns or 'worker' in columns:
+        print("Column 'worker' already exists. Migration not needed.")
+        conn.close()
+        return
+
+    # Add the column
+    try:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN worker VARCHAR(300)")
+        conn.commit()
+        print("Successfully added 'worker' column to jobs table.")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
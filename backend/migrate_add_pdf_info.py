@@ -0,0 +1,52 @@
+"""
+Migration script to add pdf_info column to documents table and fill it in
+for existing documents. Run this once to update existing database.
+"""
+import sqlite3
+import json
+import os
+
+from pdf_signer import get_pdf_info
+
+DB_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'medical_docs.db')
+
+def migrate():
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at {DB_PATH}")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        # Add the column if missing
+        cursor.execute("PRAGMA table_info(documents)")
+        columns = [col[1] for col in cursor.fetchall()]
+        if 'pdf_info' not in columns:
+            cursor.execute("ALTER TABLE documents ADD COLUMN pdf_info JSON")
+            print("Added 'pdf_info' column to documents table.")
+
+        # Backfill documents that don't have it yet
+        cursor.execute("SELECT id, original_path FROM documents WHERE pdf_info IS NULL")
+        filled = 0
+        for doc_id, original_path in cursor.fetchall():
+            try:
+                pdf_info = get_pdf_info(original_path)
+            except Exception as e:
+                print(f"Skipping document {doc_id}: {e}")
+                continue
+            cursor.execute(
+                "UPDATE documents SET pdf_info = ? WHERE id = ?",
+                (json.dumps(pdf_info), doc_id)
+            )
+            filled += 1
+
+        conn.commit()
+        print(f"Stored PDF info for {filled} document(s).")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -1,11 +1,33 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
 
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune each new SQLite connection.
+    WAL lets readers proceed while bulk signing commits, and NORMAL sync
+    means one fsync per checkpoint instead of per transaction.
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA cache_size=-64000')  # 64MB page cache
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')  # 256MB
+    cursor.close()
+
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
 
@@ -16,10 +38,12 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), default='doctor')  # 'admin' or 'doctor'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Relationship to signature
-    signature = db.relationship('Signature', backref='user', uselist=False, cascade='all, delete-orphan')
+    # Relationship to signature (1:1). Loaded on access only: most requests never
+    # use it, and signing routes look it up once via get_current_signature()
+    signature = db.relationship('Signature', back_populates='user', uselist=False,
+                                cascade='all, delete-orphan', lazy='select')
     # Relationship to signed documents
-    signed_documents = db.relationship('Document', backref='signer', foreign_keys='Document.signed_by')
+    signed_documents = db.relationship('Document', back_populates='signer', foreign_keys='Document.signed_by')
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -27,6 +51,11 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        # Hashes from older Werkzeug defaults (pbkdf2:sha256, 600k rounds) take
+        # about twice as long to verify as the current scrypt default
+        return not self.password_hash.startswith('scrypt:')
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -42,18 +71,20 @@ class Signature(db.Model):
     __tablename__ = 'signatures'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, index=True, nullable=False)
     # Encrypted signature file path
     encrypted_path = db.Column(db.String(500), nullable=False)
     # Original filename
     original_filename = db.Column(db.String(255))
     # File hash for integrity verification
-    file_hash = db.Column(db.String(64))
+    file_hash = db.Column(db.String(80))  # 'blake3:' prefix + 64 hex chars
     # Signer name for "Digitally signed by" text
     signer_name = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    user = db.relationship('User', back_populates='signature')
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -67,6 +98,13 @@ class Signature(db.Model):
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        # Status-filtered document listings, ordered by id
+        db.Index('ix_documents_status_id', 'status', 'id'),
+        # Foreign keys to users (per-user lookups and user deletes)
+        db.Index('ix_documents_uploaded_by', 'uploaded_by'),
+        db.Index('ix_documents_signed_by', 'signed_by'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -84,11 +122,15 @@ class Document(db.Model):
     signed_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     signed_at = db.Column(db.DateTime)
     signature_position = db.Column(db.JSON)  # {x, y, page, width, height}
+    pdf_info = db.Column(db.JSON)  # get_pdf_info() result, stored at upload
 
-    status = db.Column(db.String(20), default='pending')  # 'pending', 'signed', 'archived'
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'signing', 'signed', 'archived'
+    claimed_at = db.Column(db.DateTime)  # When signing started; set only while status is 'signing'
 
-    # Relationships
-    uploader = db.relationship('User', foreign_keys=[uploaded_by])
+    # Relationships; never lazy loaded, query sites that call to_dict() load
+    # them explicitly (see DOCUMENT_USERS in app.py)
+    uploader = db.relationship('User', foreign_keys=[uploaded_by], lazy='raise')
+    signer = db.relationship('User', foreign_keys=[signed_by], lazy='raise', back_populates='signed_documents')
 
     def to_dict(self):
         return {
@@ -103,3 +145,15 @@ class Document(db.Model):
             'signed_at': self.signed_at.isoformat() if self.signed_at else None,
             'status': self.status
         }
+
+
+class Job(db.Model):
+    """Background job started with ?async=1, stored so any worker process can report it."""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(20), default='queued')  # 'queued', 'running', 'finished', 'failed'
+    result = db.Column(db.JSON)  # Fields reported when finished, or {'error': ...} when failed
+    worker = db.Column(db.String(300))  # 'host:pid' of the process running the job
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -4,13 +4,51 @@ Overlay signature onto PDF documents with "Digitally signed by" text and timesta
 """
 
 import io
+import uuid
+import hashlib
+from collections import defaultdict
+from contextlib import ExitStack
 from datetime import datetime
 from PyPDF2 import PdfReader, PdfWriter
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
-from reportlab.lib.colors import black
+from reportlab.lib.colors import black, HexColor
 from PIL import Image
 
+# Use pikepdf (QPDF) to stamp overlays if available, fallback to PyPDF2
+try:
+    import pikepdf
+    HAS_PIKEPDF = True
+except ImportError:
+    HAS_PIKEPDF = False
+
+# F2F signature box colors
+F2F_BACKGROUND = HexColor('#FFF8DC')  # Cornsilk color
+F2F_BORDER = HexColor('#D4A574')  # Tan border
+F2F_TEXT = HexColor('#333333')
+F2F_LABEL = HexColor('#666666')
+F2F_VALUE = HexColor('#0066CC')
+
+# QR placeholder: corner squares (positioning patterns) as (col, row) cells
+QR_CORNERS = ((0, 0), (0, 5), (5, 0))
+
+
+class SignatureImage:
+    """
+    A decoded RGBA signature and the ReportLab reader drawn from it.
+    Built once and reused for every page and document signed with the same
+    signature; read-only afterwards, so it can be shared between threads.
+    """
+
+    def __init__(self, image: Image.Image):
+        image.load()
+        self.image = image
+        self.width, self.height = image.size
+        # Drawn straight from the PIL image (no PNG re-encode); the raw pixel
+        # data ReportLab embeds is converted once here, not per drawImage call
+        self.reader = ImageReader(image)
+        self.reader.getRGBData()
+
 
 def get_pdf_info(pdf_path: str) -> dict:
     """Get PDF metadata and page information."""
@@ -25,11 +63,11 @@ def get_pdf_info(pdf_path: str) -> dict:
             'height': float(mediabox.height)
         })
 
-    # Safely extract metadata
+    # Safely extract metadata (as strings, so the result can be stored as JSON)
     metadata = {}
     if reader.metadata:
         try:
-            metadata = dict(reader.metadata) if reader.metadata else {}
+            metadata = {key: str(value) for key, value in reader.metadata.items()}
         except:
             metadata = {}
 
@@ -40,6 +78,83 @@ def get_pdf_info(pdf_path: str) -> dict:
     }
 
 
+def write_pdf(writer: PdfWriter, output_path: str = None) -> bytes:
+    """
+    Write a finished PDF straight to output_path, or return it as bytes
+    when no path is given (so the whole file is never held twice in memory).
+    """
+    if output_path:
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+        return None
+
+    output_buffer = io.BytesIO()
+    writer.write(output_buffer)
+    return output_buffer.getvalue()
+
+
+def _stamp_overlay(pdf, page, overlay_page):
+    """
+    Draw overlay_page over page as a form XObject in the page's own coordinate
+    space, the same placement PyPDF2's merge_page gives (no rotation or scaling).
+    """
+    form = pdf.copy_foreign(overlay_page.as_form_xobject())
+    name = page.add_resource(form, pikepdf.Name.XObject, prefix='Fx')
+    page.contents_add(pikepdf.Stream(pdf, b'q\n'), prepend=True)
+    page.contents_add(pikepdf.Stream(pdf, b'\nQ\nq ' + name.unparse() + b' Do Q\n'))
+
+
+def merge_overlays(reader: PdfReader, pdf_path: str, overlays: dict, output_path: str = None) -> bytes:
+    """
+    Stamp single-page overlay PDFs (page index -> PDF bytes) onto the original
+    and write the result like write_pdf(). With pikepdf, untouched pages are
+    copied through by QPDF without being parsed in Python.
+    """
+    if HAS_PIKEPDF:
+        with pikepdf.open(pdf_path) as pdf, ExitStack() as overlay_files:
+            for page_num, overlay_data in overlays.items():
+                # Overlay files stay open until saved (QPDF copies stream data lazily)
+                overlay = overlay_files.enter_context(pikepdf.open(io.BytesIO(overlay_data)))
+                _stamp_overlay(pdf, pdf.pages[page_num], overlay.pages[0])
+
+            if output_path:
+                pdf.save(output_path)
+                return None
+            output_buffer = io.BytesIO()
+            pdf.save(output_buffer)
+            return output_buffer.getvalue()
+
+    writer = PdfWriter()
+    for page_num, page in enumerate(reader.pages):
+        overlay_data = overlays.get(page_num)
+        if overlay_data is not None:
+            page.merge_page(PdfReader(io.BytesIO(overlay_data)).pages[0])
+        writer.add_page(page)
+
+    # Copy metadata
+    if reader.metadata:
+        writer.add_metadata(reader.metadata)
+
+    return write_pdf(writer, output_path)
+
+
+def load_signature_image(signature) -> SignatureImage:
+    """
+    Return the signature ready to draw.
+    Accepts PNG bytes, a PIL image or an already prepared SignatureImage, so
+    callers signing many pages or documents can decode the PNG once.
+    """
+    if isinstance(signature, SignatureImage):
+        return signature
+    if isinstance(signature, Image.Image):
+        sig_image = signature
+    else:
+        sig_image = Image.open(io.BytesIO(signature))
+    if sig_image.mode != 'RGBA':
+        sig_image = sig_image.convert('RGBA')
+    return SignatureImage(sig_image)
+
+
 def draw_signature_with_text(
     overlay_canvas,
     sig_reader,
@@ -72,33 +187,44 @@ def draw_signature_with_text(
 
     # Add text below signature if signer_name provided
     if signer_name:
-        overlay_canvas.setFillColor(black)
-
         # Font settings
         font_size = 7
         line_height = 9
-        overlay_canvas.setFont("Helvetica", font_size)
 
-        # Calculate text position (below signature)
-        text_x = x
-        text_y = y - line_height  # Start below signature
+        # All lines go in one text object, starting below the signature
+        text = overlay_canvas.beginText(x, y - line_height)
+        text.setFillColor(black)
 
         # "Digitally signed by"
-        overlay_canvas.drawString(text_x, text_y, "Digitally signed by")
-        text_y -= line_height
+        text.setFont("Helvetica", font_size, line_height)
+        text.textLine("Digitally signed by")
 
         # Signer name
-        overlay_canvas.setFont("Helvetica-Bold", font_size)
-        overlay_canvas.drawString(text_x, text_y, signer_name)
-        text_y -= line_height
+        text.setFont("Helvetica-Bold", font_size, line_height)
+        text.textLine(signer_name)
 
         # Timestamp
-        overlay_canvas.setFont("Helvetica", font_size)
+        text.setFont("Helvetica", font_size, line_height)
         if timestamp:
             date_str = timestamp.strftime("Date: %Y-%m-%d %H:%M:%S")
         else:
             date_str = datetime.now().strftime("Date: %Y-%m-%d %H:%M:%S")
-        overlay_canvas.drawString(text_x, text_y, date_str)
+        text.textLine(date_str)
+
+        overlay_canvas.drawText(text)
+
+
+def qr_data_cells(document_id: str) -> list[tuple[int, int]]:
+    """(col, row) cells of the QR placeholder filled for a document ID."""
+    hash_bytes = hashlib.md5(document_id.encode()).digest()
+    cells = []
+    for i, byte in enumerate(hash_bytes[:12]):
+        if byte % 3 == 0:
+            row = (i // 4) + 2
+            col = (i % 4) + 2
+            if row < 6 and col < 6:
+                cells.append((col, row))
+    return cells
 
 
 def draw_f2f_signature_with_textbox(
@@ -130,12 +256,9 @@ def draw_f2f_signature_with_textbox(
     | Signer: {Name}                   |        |
     +----------------------------------+--------+
     """
-    from reportlab.lib.colors import HexColor
-    import uuid as uuid_module
-
     # Generate document ID if not provided
     if not document_id:
-        document_id = str(uuid_module.uuid4())
+        document_id = str(uuid.uuid4())
 
     # Default IP address
     if not ip_address:
@@ -163,14 +286,14 @@ def draw_f2f_signature_with_textbox(
     total_box_height = title_height + sig_area_height + info_height + (box_padding * 2)
 
     # Background fill (light cream/yellow like the example)
-    overlay_canvas.setFillColor(HexColor('#FFF8DC'))  # Cornsilk color
-    overlay_canvas.setStrokeColor(HexColor('#D4A574'))  # Tan border
+    overlay_canvas.setFillColor(F2F_BACKGROUND)
+    overlay_canvas.setStrokeColor(F2F_BORDER)
     overlay_canvas.setLineWidth(1.5)
     box_y = y - total_box_height + sig_height
     overlay_canvas.rect(x, box_y, box_width, total_box_height, fill=1, stroke=1)
 
     # Title: "Electronic Signature"
-    overlay_canvas.setFillColor(HexColor('#333333'))
+    overlay_canvas.setFillColor(F2F_TEXT)
     overlay_canvas.setFont("Helvetica-Bold", title_font_size)
     title_y = y + sig_height - box_padding - title_font_size
     overlay_canvas.drawString(x + box_padding, title_y, "Electronic Signature")
@@ -191,70 +314,58 @@ def draw_f2f_signature_with_textbox(
     qr_y = box_y + (total_box_height - qr_size) / 2  # Center vertically
 
     # Draw QR code border
-    overlay_canvas.setStrokeColor(HexColor('#333333'))
+    overlay_canvas.setStrokeColor(F2F_TEXT)
     overlay_canvas.setLineWidth(0.5)
     overlay_canvas.rect(qr_x, qr_y, qr_size, qr_size, fill=0, stroke=1)
 
-    # Draw simple QR-like pattern
-    overlay_canvas.setFillColor(HexColor('#333333'))
+    # Draw simple QR-like pattern, all cells as one filled path
+    overlay_canvas.setFillColor(F2F_TEXT)
     cell_size = qr_size / 7
+    qr_path = overlay_canvas.beginPath()
     # Corner squares (QR code positioning patterns)
-    for corner in [(0, 0), (0, 5), (5, 0)]:
-        cx, cy = corner
-        overlay_canvas.rect(qr_x + cx * cell_size, qr_y + cy * cell_size,
-                           2 * cell_size, 2 * cell_size, fill=1, stroke=0)
+    for cx, cy in QR_CORNERS:
+        qr_path.rect(qr_x + cx * cell_size, qr_y + cy * cell_size, 2 * cell_size, 2 * cell_size)
     # Some random-looking data cells
-    import hashlib
-    hash_bytes = hashlib.md5(document_id.encode()).digest()
-    for i, byte in enumerate(hash_bytes[:12]):
-        if byte % 3 == 0:
-            row = (i // 4) + 2
-            col = (i % 4) + 2
-            if row < 6 and col < 6:
-                overlay_canvas.rect(qr_x + col * cell_size, qr_y + row * cell_size,
-                                   cell_size * 0.8, cell_size * 0.8, fill=1, stroke=0)
+    data_size = cell_size * 0.8
+    for col, row in qr_data_cells(document_id):
+        qr_path.rect(qr_x + col * cell_size, qr_y + row * cell_size, data_size, data_size)
+    overlay_canvas.drawPath(qr_path, fill=1, stroke=0)
 
-    # Info section below signature
-    info_y = sig_y - 12
+    # Info section below signature, as one text object
+    info = overlay_canvas.beginText(x + box_padding, sig_y - 12)
 
     # Document ID label
-    overlay_canvas.setFont("Helvetica", label_font_size)
-    overlay_canvas.setFillColor(HexColor('#666666'))
-    overlay_canvas.drawString(x + box_padding, info_y, "Document ID:")
-    info_y -= line_height
+    info.setFont("Helvetica", label_font_size, line_height)
+    info.setFillColor(F2F_LABEL)
+    info.textLine("Document ID:")
 
     # Document ID value (in blue like example)
-    overlay_canvas.setFont("Helvetica", value_font_size)
-    overlay_canvas.setFillColor(HexColor('#0066CC'))
+    info.setFont("Helvetica", value_font_size, line_height)
+    info.setFillColor(F2F_VALUE)
     # Truncate ID if too long
     display_id = document_id[:36] if len(document_id) > 36 else document_id
-    overlay_canvas.drawString(x + box_padding, info_y, display_id)
-    info_y -= line_height
+    info.textLine(display_id)
 
     # IP Address
-    overlay_canvas.setFillColor(HexColor('#666666'))
-    overlay_canvas.setFont("Helvetica", label_font_size)
-    overlay_canvas.drawString(x + box_padding, info_y, f"IP Address: {ip_address}")
-    info_y -= line_height
+    info.setFillColor(F2F_LABEL)
+    info.setFont("Helvetica", label_font_size, line_height)
+    info.textLine(f"IP Address: {ip_address}")
 
     # Time
-    overlay_canvas.setFillColor(HexColor('#333333'))
-    overlay_canvas.setFont("Helvetica", label_font_size)
+    info.setFillColor(F2F_TEXT)
     if timestamp:
         time_str = timestamp.strftime("Time: %A, %d %B %Y %H:%M:%S")
     else:
         time_str = datetime.now().strftime("Time: %A, %d %B %Y %H:%M:%S")
-    overlay_canvas.drawString(x + box_padding, info_y, time_str)
-    info_y -= line_height
+    info.textLine(time_str)
+
+    # Signer (label, then the name in bold right after it)
+    info.textOut("Signer: ")
+    info.setFont("Helvetica-Bold", label_font_size, line_height)
+    info.setFillColor(F2F_VALUE)
+    info.textOut(signer_name or "Unknown")
 
-    # Signer
-    overlay_canvas.setFont("Helvetica", label_font_size)
-    overlay_canvas.setFillColor(HexColor('#333333'))
-    overlay_canvas.drawString(x + box_padding, info_y, "Signer: ")
-    overlay_canvas.setFont("Helvetica-Bold", label_font_size)
-    overlay_canvas.setFillColor(HexColor('#0066CC'))
-    signer_x = x + box_padding + overlay_canvas.stringWidth("Signer: ", "Helvetica", label_font_size)
-    overlay_canvas.drawString(signer_x, info_y, signer_name or "Unknown")
+    overlay_canvas.drawText(info)
 
 
 def add_f2f_signature_to_pdf(
@@ -264,7 +375,8 @@ def add_f2f_signature_to_pdf(
     output_path: str = None,
     signer_name: str = None,
     document_id: str = None,
-    ip_address: str = None
+    ip_address: str = None,
+    timestamp: datetime = None
 ) -> bytes:
     """
     Add F2F signature with text box to PDF (last page only).
@@ -272,15 +384,16 @@ def add_f2f_signature_to_pdf(
 
     Args:
         pdf_path: Path to original PDF
-        signature_data: PNG bytes of signature
+        signature_data: PNG bytes of signature, or an already decoded image
         position: {x, y, page, width, height}
         output_path: Optional path to save signed PDF
         signer_name: Name for text box
         document_id: Optional document ID for the signature box
         ip_address: IP address of the signer
+        timestamp: Signing time shown in the box (defaults to now)
 
     Returns:
-        Signed PDF as bytes
+        Signed PDF as bytes, or None when written to output_path
     """
     reader = PdfReader(pdf_path)
     num_pages = len(reader.pages)
@@ -292,9 +405,7 @@ def add_f2f_signature_to_pdf(
     page_height = float(target_page.mediabox.height)
 
     # Prepare signature image
-    sig_image = Image.open(io.BytesIO(signature_data))
-    if sig_image.mode != 'RGBA':
-        sig_image = sig_image.convert('RGBA')
+    sig_image = load_signature_image(signature_data)
 
     sig_width = position.get('width', sig_image.width)
     sig_height = position.get('height', sig_image.height)
@@ -314,11 +425,7 @@ def add_f2f_signature_to_pdf(
     # Create overlay
     packet = io.BytesIO()
     overlay_canvas = canvas.Canvas(packet, pagesize=(page_width, page_height))
-
-    sig_buffer = io.BytesIO()
-    sig_image.save(sig_buffer, format='PNG')
-    sig_buffer.seek(0)
-    sig_reader = ImageReader(sig_buffer)
+    sig_reader = sig_image.reader
 
     # Draw F2F signature with text box
     draw_f2f_signature_with_textbox(
@@ -327,7 +434,7 @@ def add_f2f_signature_to_pdf(
         x, y,
         sig_width, sig_height,
         signer_name=signer_name,
-        timestamp=datetime.now(),
+        timestamp=timestamp or datetime.now(),
         document_id=document_id,
         ip_address=ip_address
     )
@@ -335,28 +442,7 @@ def add_f2f_signature_to_pdf(
     overlay_canvas.save()
 
     # Merge
-    packet.seek(0)
-    overlay_reader = PdfReader(packet)
-    writer = PdfWriter()
-
-    for i, page in enumerate(reader.pages):
-        if i == page_num:
-            page.merge_page(overlay_reader.pages[0])
-        writer.add_page(page)
-
-    if reader.metadata:
-        writer.add_metadata(reader.metadata)
-
-    output_buffer = io.BytesIO()
-    writer.write(output_buffer)
-    output_buffer.seek(0)
-    result_bytes = output_buffer.getvalue()
-
-    if output_path:
-        with open(output_path, 'wb') as f:
-            f.write(result_bytes)
-
-    return result_bytes
+    return merge_overlays(reader, pdf_path, {page_num: packet.getvalue()}, output_path)
 
 
 def add_signature_to_pdf(
@@ -364,14 +450,16 @@ def add_signature_to_pdf(
     signature_data: bytes,
     position: dict,
     output_path: str = None,
-    signer_name: str = None
+    signer_name: str = None,
+    timestamp: datetime = None
 ) -> bytes:
     """
     Add signature image to PDF at specified position with optional signer info.
 
     Args:
         pdf_path: Path to original PDF
-        signature_data: PNG bytes of signature (with transparent background)
+        signature_data: PNG bytes of signature (with transparent background),
+            or an already decoded image
         position: {
             'x': float,  # X position from left
             'y': float,  # Y position from top (will be converted)
@@ -381,9 +469,10 @@ def add_signature_to_pdf(
         }
         output_path: Optional path to save signed PDF
         signer_name: Name for "Digitally signed by" text
+        timestamp: Signing time shown under the signature (defaults to now)
 
     Returns:
-        Signed PDF as bytes
+        Signed PDF as bytes, or None when written to output_path
     """
     # Read original PDF
     reader = PdfReader(pdf_path)
@@ -398,9 +487,7 @@ def add_signature_to_pdf(
     page_height = float(target_page.mediabox.height)
 
     # Prepare signature image
-    sig_image = Image.open(io.BytesIO(signature_data))
-    if sig_image.mode != 'RGBA':
-        sig_image = sig_image.convert('RGBA')
+    sig_image = load_signature_image(signature_data)
 
     # Get signature dimensions
     sig_width = position.get('width', sig_image.width)
@@ -432,10 +519,7 @@ def add_signature_to_pdf(
     overlay_canvas = canvas.Canvas(packet, pagesize=(page_width, page_height))
 
     # Draw signature with transparency support
-    sig_buffer = io.BytesIO()
-    sig_image.save(sig_buffer, format='PNG')
-    sig_buffer.seek(0)
-    sig_reader = ImageReader(sig_buffer)
+    sig_reader = sig_image.reader
 
     # Draw signature with optional text
     draw_signature_with_text(
@@ -444,43 +528,21 @@ def add_signature_to_pdf(
         x, y,
         sig_width, sig_height,
         signer_name=signer_name,
-        timestamp=datetime.now()
+        timestamp=timestamp or datetime.now()
     )
 
     overlay_canvas.save()
 
     # Merge overlay with original PDF
-    packet.seek(0)
-    overlay_reader = PdfReader(packet)
-    writer = PdfWriter()
-
-    for i, page in enumerate(reader.pages):
-        if i == page_num:
-            page.merge_page(overlay_reader.pages[0])
-        writer.add_page(page)
-
-    # Copy metadata
-    if reader.metadata:
-        writer.add_metadata(reader.metadata)
-
-    # Output
-    output_buffer = io.BytesIO()
-    writer.write(output_buffer)
-    output_buffer.seek(0)
-    result_bytes = output_buffer.getvalue()
-
-    if output_path:
-        with open(output_path, 'wb') as f:
-            f.write(result_bytes)
-
-    return result_bytes
+    return merge_overlays(reader, pdf_path, {page_num: packet.getvalue()}, output_path)
 
 
 def add_multiple_signatures(
     pdf_path: str,
     signatures: list[dict],
     output_path: str = None,
-    signer_name: str = None
+    signer_name: str = None,
+    timestamp: datetime = None
 ) -> bytes:
     """
     Add multiple signatures to a PDF with optional signer info.
@@ -488,92 +550,146 @@ def add_multiple_signatures(
     Args:
         pdf_path: Path to original PDF
         signatures: List of {
-            'signature_data': bytes,
+            'signature_data': bytes, PIL image or SignatureImage,
             'position': {x, y, page, width, height}
         }
         output_path: Optional path to save signed PDF
         signer_name: Name for "Digitally signed by" text
+        timestamp: Signing time shown under every signature (defaults to now)
 
     Returns:
-        Signed PDF as bytes
+        Signed PDF as bytes, or None when written to output_path
     """
-    # Start with original PDF
-    current_pdf_bytes = open(pdf_path, 'rb').read()
-    timestamp = datetime.now()
+    reader = PdfReader(pdf_path)
+    timestamp = timestamp or datetime.now()  # Same timestamp for all signatures
 
+    # Group signatures by target page (range() normalizes negative page
+    # numbers and raises IndexError for missing pages, like reader.pages)
+    page_indexes = range(len(reader.pages))
+    signatures_by_page = defaultdict(list)
     for sig_info in signatures:
-        # Create temp reader from current state
-        temp_buffer = io.BytesIO(current_pdf_bytes)
+        page_num = page_indexes[sig_info['position'].get('page', 0)]
+        signatures_by_page[page_num].append(sig_info)
 
-        # For each signature, we need to work with the bytes
-        reader = PdfReader(temp_buffer)
-        page_num = sig_info['position'].get('page', 0)
-        target_page = reader.pages[page_num]
-        page_width = float(target_page.mediabox.width)
-        page_height = float(target_page.mediabox.height)
+    # One overlay per page carrying all of its signatures
+    overlays = {}
+    for page_num, page_signatures in signatures_by_page.items():
+        page = reader.pages[page_num]
+        page_width = float(page.mediabox.width)
+        page_height = float(page.mediabox.height)
 
-        # Prepare signature
-        sig_data = sig_info['signature_data']
-        sig_image = Image.open(io.BytesIO(sig_data))
-        if sig_image.mode != 'RGBA':
-            sig_image = sig_image.convert('RGBA')
+        packet = io.BytesIO()
+        overlay_canvas = canvas.Canvas(packet, pagesize=(page_width, page_height))
 
-        pos = sig_info['position']
-        sig_width = pos.get('width', sig_image.width)
-        sig_height = pos.get('height', sig_image.height)
+        for sig_info in page_signatures:
+            # Prepare signature
+            sig_image = load_signature_image(sig_info['signature_data'])
 
-        # Calculate text height if signer_name provided
-        text_height = 30 if signer_name else 0
+            pos = sig_info['position']
+            sig_width = pos.get('width', sig_image.width)
+            sig_height = pos.get('height', sig_image.height)
 
-        x = float(pos.get('x', 100))
-        y_from_top = float(pos.get('y', 100))
-        y = page_height - y_from_top - sig_height
+            # Calculate text height if signer_name provided
+            text_height = 30 if signer_name else 0
 
-        # Ensure space for text
-        y = max(text_height, y)
+            x = float(pos.get('x', 100))
+            y_from_top = float(pos.get('y', 100))
+            y = page_height - y_from_top - sig_height
 
-        # Create overlay
-        packet = io.BytesIO()
-        overlay_canvas = canvas.Canvas(packet, pagesize=(page_width, page_height))
+            # Ensure space for text
+            y = max(text_height, y)
 
-        sig_buffer = io.BytesIO()
-        sig_image.save(sig_buffer, format='PNG')
-        sig_buffer.seek(0)
-        sig_reader = ImageReader(sig_buffer)
-
-        # Draw signature with optional text
-        draw_signature_with_text(
-            overlay_canvas,
-            sig_reader,
-            x, y,
-            sig_width, sig_height,
-            signer_name=signer_name,
-            timestamp=timestamp  # Use same timestamp for all signatures
-        )
+            # Draw signature with optional text
+            draw_signature_with_text(
+                overlay_canvas,
+                sig_image.reader,
+                x, y,
+                sig_width, sig_height,
+                signer_name=signer_name,
+                timestamp=timestamp
+            )
 
         overlay_canvas.save()
+        overlays[page_num] = packet.getvalue()
 
-        # Merge
-        packet.seek(0)
-        overlay_reader = PdfReader(packet)
-        writer = PdfWriter()
+    # Merge
+    return merge_overlays(reader, pdf_path, overlays, output_path)
 
-        temp_buffer.seek(0)
-        reader = PdfReader(temp_buffer)
 
-        for i, page in enumerate(reader.pages):
-            if i == page_num:
-                page.merge_page(overlay_reader.pages[0])
-            writer.add_page(page)
+def sign_pdf(
+    pdf_path: str,
+    positions: list[dict],
+    output_path: str,
+    signer_name: str = None,
+    is_f2f: bool = False,
+    document_id: str = None,
+    ip_address: str = None,
+    signature_data: bytes = None,
+    timestamp: datetime = None
+) -> str:
+    """
+    Sign one PDF at the given positions.
+    F2F documents get the text box on the first position only; otherwise
+    one or more plain signatures are added.
 
-        # Update current state
-        output_buffer = io.BytesIO()
-        writer.write(output_buffer)
-        output_buffer.seek(0)
-        current_pdf_bytes = output_buffer.getvalue()
+    signature_data may be PNG bytes or a SignatureImage from
+    load_signature_image (see sign_pdfs for signing many documents).
+    Passing one timestamp for a whole batch gives every document the same
+    signing time.
+
+    Returns:
+        Path of the signed PDF
+    """
+    signature_data = load_signature_image(signature_data)
+
+    if is_f2f:
+        add_f2f_signature_to_pdf(
+            pdf_path=pdf_path,
+            signature_data=signature_data,
+            position=positions[0],  # F2F only uses first position (last page)
+            output_path=output_path,
+            signer_name=signer_name,
+            document_id=document_id,
+            ip_address=ip_address,
+            timestamp=timestamp
+        )
+    elif len(positions) > 1:
+        add_multiple_signatures(
+            pdf_path=pdf_path,
+            signatures=[
+                {'signature_data': signature_data, 'position': pos}
+                for pos in positions
+            ],
+            output_path=output_path,
+            signer_name=signer_name,
+            timestamp=timestamp
+        )
+    else:
+        add_signature_to_pdf(
+            pdf_path=pdf_path,
+            signature_data=signature_data,
+            position=positions[0],
+            output_path=output_path,
+            signer_name=signer_name,
+            timestamp=timestamp
+        )
+
+    return output_path
 
-    if output_path:
-        with open(output_path, 'wb') as f:
-            f.write(current_pdf_bytes)
 
-    return current_pdf_bytes
+def sign_pdfs(signature_data, jobs: list[dict]) -> list:
+    """
+    Sign several PDFs with one signature, decoding it once for the batch.
+    Each job holds sign_pdf keyword arguments. Returns the exception raised
+    for each job (None when it was signed), so one bad document doesn't stop
+    the rest.
+    """
+    signature_image = load_signature_image(signature_data)
+    errors = []
+    for kwargs in jobs:
+        try:
+            sign_pdf(signature_data=signature_image, **kwargs)
+            errors.append(None)
+        except Exception as e:
+            errors.append(e)
+    return errors
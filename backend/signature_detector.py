@@ -8,10 +8,18 @@ Avoids center area of pages (signatures typically at bottom or sides).
 Falls back to blank space on last page if no keyword found.
 """
 
+import os
 import re
+import copy
 import random
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
 import pdfplumber
 
+logger = logging.getLogger(__name__)
+
 # Pattern to match only the word "signature" (case-insensitive)
 SIGNATURE_PATTERN = re.compile(r'\bsignature\b', re.IGNORECASE)
 
@@ -22,6 +30,65 @@ PADDING = 10  # Minimum padding from other elements
 TEXT_HEIGHT = 30  # Space for "Digitally signed by" text below signature
 
 
+def cached_by_file(detect, maxsize=256):
+    """
+    Cache a detector's results per file version (path, mtime, size), so
+    detecting the same PDF again (bulk-detect preview, then bulk sign; repeat
+    visits to the sign page) skips pdfplumber's page parsing. A replaced file
+    gets a new key. Every caller gets its own copy of the result.
+
+    The cache lives in the calling process. Callers that run the detector in
+    worker processes look results up with wrapper.cached() first and hand the
+    workers' results back with wrapper.remember().
+    """
+    cache = OrderedDict()
+    lock = threading.Lock()
+
+    def file_key(pdf_path, args, kwargs):
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        return (pdf_path, stat.st_mtime_ns, stat.st_size, args, tuple(sorted(kwargs.items())))
+
+    def cached(pdf_path, *args, **kwargs):
+        """Cached result for the file as it is now, or None."""
+        key = file_key(pdf_path, args, kwargs)
+        with lock:
+            result = cache.get(key) if key else None
+            if result is not None:
+                cache.move_to_end(key)
+        return copy.deepcopy(result)
+
+    def remember(pdf_path, result, *args, **kwargs):
+        """Store a result computed elsewhere (e.g. in a worker process)."""
+        key = file_key(pdf_path, args, kwargs)
+        if key is None:
+            return
+        with lock:
+            cache[key] = copy.deepcopy(result)
+            cache.move_to_end(key)
+            while len(cache) > maxsize:
+                cache.popitem(last=False)
+
+    @wraps(detect)
+    def wrapper(pdf_path, *args, **kwargs):
+        result = cached(pdf_path, *args, **kwargs)
+        if result is None:
+            result = detect(pdf_path, *args, **kwargs)
+            remember(pdf_path, result, *args, **kwargs)
+        return result
+
+    def cache_clear():
+        with lock:
+            cache.clear()
+
+    wrapper.cached = cached
+    wrapper.remember = remember
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
 def is_in_center_area(x, y, page_width, page_height, sig_width, sig_height):
     """
     Check if a position is in the center area of the page.
@@ -44,7 +111,67 @@ def is_in_center_area(x, y, page_width, page_height, sig_width, sig_height):
     return in_center_x and in_center_y
 
 
-def find_blank_space_on_page(page, sig_width=SIG_WIDTH, sig_height=SIG_HEIGHT, avoid_center=True):
+def occupied_boxes(page, words):
+    """
+    Padded bounding boxes (x0, top, x1, bottom) of a page's words, lines and
+    rects: the areas a signature must not overlap. Plain tuples, so the
+    overlap tests in the grid searches unpack them instead of doing four
+    dict lookups per box.
+    """
+    boxes = [
+        (float(word['x0']) - PADDING, float(word['top']) - PADDING,
+         float(word['x1']) + PADDING, float(word['bottom']) + PADDING)
+        for word in words
+    ]
+
+    # Also check for lines/rectangles (form fields, boxes)
+    try:
+        for obj in page.lines or []:
+            boxes.append((float(obj['x0']) - PADDING, float(obj['top']) - PADDING,
+                          float(obj['x1']) + PADDING, float(obj['bottom']) + PADDING))
+        for obj in page.rects or []:
+            boxes.append((float(obj['x0']) - PADDING, float(obj['top']) - PADDING,
+                          float(obj['x1']) + PADDING, float(obj['bottom']) + PADDING))
+    except Exception:
+        pass  # Some PDFs may not have lines/rects
+
+    return boxes
+
+
+def is_area_clear(boxes, x, y, width, height, page_width, page_height):
+    """Check if a rectangular area is inside the page margins and free from obstacles."""
+    if x < PADDING or y < PADDING:
+        return False
+    if x + width > page_width - PADDING or y + height > page_height - PADDING:
+        return False
+
+    right = x + width
+    bottom = y + height
+    for x0, y0, x1, y1 in boxes:
+        if not (right < x0 or x > x1 or bottom < y0 or y > y1):
+            return False
+    return True
+
+
+def boxes_by_row(boxes, height):
+    """
+    Return a function giving the boxes that vertically overlap [y, y + height],
+    filtered once per row. The grid searches test many x positions for each y,
+    so each test only scans the boxes in its row instead of the whole page.
+    """
+    rows = {}
+
+    def row(y):
+        band = rows.get(y)
+        if band is None:
+            bottom = y + height
+            band = rows[y] = [box for box in boxes if not (bottom < box[1] or y > box[3])]
+        return band
+
+    return row
+
+
+def find_blank_space_on_page(page, sig_width=SIG_WIDTH, sig_height=SIG_HEIGHT, avoid_center=True, words=None):
     """
     Find blank space on a page suitable for signature placement.
     Prefers bottom areas of the page, avoids center.
@@ -54,6 +181,7 @@ def find_blank_space_on_page(page, sig_width=SIG_WIDTH, sig_height=SIG_HEIGHT, a
         sig_width: Width of signature
         sig_height: Height of signature
         avoid_center: Whether to avoid center area
+        words: The page's extract_words() result, if already extracted
 
     Returns:
         dict with x, y coordinates of best blank space, or None if not found
@@ -62,104 +190,47 @@ def find_blank_space_on_page(page, sig_width=SIG_WIDTH, sig_height=SIG_HEIGHT, a
     page_height = float(page.height)
 
     # Extract words
-    words = page.extract_words() or []
+    if words is None:
+        words = page.extract_words() or []
 
     # Build list of occupied rectangles
-    occupied_rects = []
-    for word in words:
-        occupied_rects.append({
-            'x0': float(word['x0']) - PADDING,
-            'y0': float(word['top']) - PADDING,
-            'x1': float(word['x1']) + PADDING,
-            'y1': float(word['bottom']) + PADDING
-        })
-
-    # Also check for lines/rectangles
-    try:
-        lines = page.lines or []
-        for line in lines:
-            occupied_rects.append({
-                'x0': float(line['x0']) - PADDING,
-                'y0': float(line['top']) - PADDING,
-                'x1': float(line['x1']) + PADDING,
-                'y1': float(line['bottom']) + PADDING
-            })
-
-        rects = page.rects or []
-        for rect in rects:
-            occupied_rects.append({
-                'x0': float(rect['x0']) - PADDING,
-                'y0': float(rect['top']) - PADDING,
-                'x1': float(rect['x1']) + PADDING,
-                'y1': float(rect['bottom']) + PADDING
-            })
-    except:
-        pass
+    boxes = occupied_boxes(page, words)
 
     total_height = sig_height + TEXT_HEIGHT  # Account for text below signature
 
-    def is_area_clear(x, y, width, height):
-        """Check if a rectangular area is free from obstacles."""
-        if x < PADDING or y < PADDING:
-            return False
-        if x + width > page_width - PADDING or y + height > page_height - PADDING:
-            return False
+    row = boxes_by_row(boxes, total_height)
 
-        for rect in occupied_rects:
-            if not (x + width < rect['x0'] or x > rect['x1'] or
-                    y + height < rect['y0'] or y > rect['y1']):
-                return False
-        return True
+    def is_clear(x, y):
+        return is_area_clear(row(y), x, y, sig_width, total_height, page_width, page_height)
 
-    # Search for blank space with STRONG priority on bottom areas
-    # Priority 1: Bottom-left quadrant (most common for signatures)
-    # Priority 2: Bottom-right quadrant
-    # Priority 3: Other areas only as last resort
+    # Search for blank space with STRONG priority on bottom areas, region by
+    # region: (y rows top-down from, to), (x columns from, to), skip center?
     step = 15  # Finer step for better positioning
-
-    # Priority 1: Bottom-left quadrant - search very thoroughly
-    # Bottom 40% of page, left 50%
-    bottom_start_y = page_height * 0.6
-    for y in range(int(page_height - total_height - PADDING), int(bottom_start_y), -step):
-        for x in range(PADDING, int(page_width * 0.5), step):
-            if is_area_clear(x, y, sig_width, total_height):
-                if not (avoid_center and is_in_center_area(x, y, page_width, page_height, sig_width, sig_height)):
-                    return {'x': float(x), 'y': float(y)}
-
-    # Priority 2: Bottom-right quadrant
-    # Bottom 40% of page, right 50%
-    for y in range(int(page_height - total_height - PADDING), int(bottom_start_y), -step):
-        for x in range(int(page_width * 0.5), int(page_width - sig_width - PADDING), step):
-            if is_area_clear(x, y, sig_width, total_height):
-                if not (avoid_center and is_in_center_area(x, y, page_width, page_height, sig_width, sig_height)):
-                    return {'x': float(x), 'y': float(y)}
-
-    # Priority 3: Middle-left area (above bottom quadrant but still left side)
-    for y in range(int(bottom_start_y), int(page_height * 0.3), -step):
-        for x in range(PADDING, int(page_width * 0.3), step):
-            if is_area_clear(x, y, sig_width, total_height):
-                if not (avoid_center and is_in_center_area(x, y, page_width, page_height, sig_width, sig_height)):
-                    return {'x': float(x), 'y': float(y)}
-
-    # Priority 4: Middle-right area
-    for y in range(int(bottom_start_y), int(page_height * 0.3), -step):
-        for x in range(int(page_width * 0.7), int(page_width - sig_width - PADDING), step):
-            if is_area_clear(x, y, sig_width, total_height):
-                if not (avoid_center and is_in_center_area(x, y, page_width, page_height, sig_width, sig_height)):
-                    return {'x': float(x), 'y': float(y)}
-
-    # Last resort: any clear space on the page (excluding center)
-    for y in range(int(page_height - total_height - PADDING), PADDING, -step):
-        for x in range(PADDING, int(page_width - sig_width - PADDING), step):
-            if is_area_clear(x, y, sig_width, total_height):
-                if not is_in_center_area(x, y, page_width, page_height, sig_width, sig_height):
-                    return {'x': float(x), 'y': float(y)}
-
-    # Absolute last resort: even center if nothing else available
-    for y in range(int(page_height - total_height - PADDING), PADDING, -step):
-        for x in range(PADDING, int(page_width - sig_width - PADDING), step):
-            if is_area_clear(x, y, sig_width, total_height):
-                return {'x': float(x), 'y': float(y)}
+    top_y = int(page_height - total_height - PADDING)
+    bottom_start_y = int(page_height * 0.6)
+    middle_end_y = int(page_height * 0.3)
+    right_x = int(page_width - sig_width - PADDING)
+    regions = [
+        # Priority 1: Bottom-left quadrant (bottom 40% of page, left 50%)
+        ((top_y, bottom_start_y), (PADDING, int(page_width * 0.5)), avoid_center),
+        # Priority 2: Bottom-right quadrant (bottom 40% of page, right 50%)
+        ((top_y, bottom_start_y), (int(page_width * 0.5), right_x), avoid_center),
+        # Priority 3: Middle-left area (above bottom quadrant but still left side)
+        ((bottom_start_y, middle_end_y), (PADDING, int(page_width * 0.3)), avoid_center),
+        # Priority 4: Middle-right area
+        ((bottom_start_y, middle_end_y), (int(page_width * 0.7), right_x), avoid_center),
+        # Last resort: any clear space on the page (excluding center)
+        ((top_y, PADDING), (PADDING, right_x), True),
+        # Absolute last resort: even center if nothing else available
+        ((top_y, PADDING), (PADDING, right_x), False),
+    ]
+
+    for (y_from, y_to), (x_from, x_to), skip_center in regions:
+        for y in range(y_from, y_to, -step):
+            for x in range(x_from, x_to, step):
+                if is_clear(x, y):
+                    if not (skip_center and is_in_center_area(x, y, page_width, page_height, sig_width, sig_height)):
+                        return {'x': float(x), 'y': float(y)}
 
     return None
 
@@ -187,55 +258,11 @@ def find_blank_space_near_keyword(page, keyword_word, all_words, sig_width=SIG_W
     keyword_bottom = float(keyword_word['bottom'])
     keyword_right = float(keyword_word['x1'])
 
-    # Build list of occupied rectangles (text bounding boxes)
-    occupied_rects = []
-    for word in all_words:
-        occupied_rects.append({
-            'x0': float(word['x0']) - PADDING,
-            'y0': float(word['top']) - PADDING,
-            'x1': float(word['x1']) + PADDING,
-            'y1': float(word['bottom']) + PADDING
-        })
-
-    # Also check for lines/rectangles (form fields, boxes)
-    try:
-        lines = page.lines or []
-        for line in lines:
-            occupied_rects.append({
-                'x0': float(line['x0']) - PADDING,
-                'y0': float(line['top']) - PADDING,
-                'x1': float(line['x1']) + PADDING,
-                'y1': float(line['bottom']) + PADDING
-            })
-
-        rects = page.rects or []
-        for rect in rects:
-            occupied_rects.append({
-                'x0': float(rect['x0']) - PADDING,
-                'y0': float(rect['top']) - PADDING,
-                'x1': float(rect['x1']) + PADDING,
-                'y1': float(rect['bottom']) + PADDING
-            })
-    except:
-        pass  # Some PDFs may not have lines/rects
+    # Build list of occupied rectangles (text bounding boxes, lines, rects)
+    boxes = occupied_boxes(page, all_words)
 
     total_height = sig_height + TEXT_HEIGHT  # Account for text below signature
-
-    def is_area_clear(x, y, width, height):
-        """Check if a rectangular area is free from obstacles."""
-        # Check page bounds
-        if x < PADDING or y < PADDING:
-            return False
-        if x + width > page_width - PADDING or y + height > page_height - PADDING:
-            return False
-
-        # Check against all occupied rectangles
-        for rect in occupied_rects:
-            # Check for overlap
-            if not (x + width < rect['x0'] or x > rect['x1'] or
-                    y + height < rect['y0'] or y > rect['y1']):
-                return False
-        return True
+    row = boxes_by_row(boxes, total_height)
 
     def distance_from_keyword(x, y):
         """Calculate distance from candidate position to keyword."""
@@ -318,7 +345,7 @@ def find_blank_space_near_keyword(page, keyword_word, all_words, sig_width=SIG_W
     best_score = float('inf')
 
     for x, y in candidates:
-        if is_area_clear(x, y, sig_width, total_height):
+        if is_area_clear(row(y), x, y, sig_width, total_height, page_width, page_height):
             # Skip center area in first pass
             if is_in_center_area(x, y, page_width, page_height, sig_width, sig_height):
                 continue
@@ -330,7 +357,7 @@ def find_blank_space_near_keyword(page, keyword_word, all_words, sig_width=SIG_W
     # If no non-center position found, accept center as last resort
     if best_pos is None:
         for x, y in candidates:
-            if is_area_clear(x, y, sig_width, total_height):
+            if is_area_clear(row(y), x, y, sig_width, total_height, page_width, page_height):
                 score = position_score(x, y)
                 if score < best_score:
                     best_score = score
@@ -351,7 +378,27 @@ def find_blank_space_near_keyword(page, keyword_word, all_words, sig_width=SIG_W
     }
 
 
-def detect_all_signature_positions(pdf_path: str) -> dict:
+def find_signature_word(words):
+    """
+    Return the first word containing "signature", or None if the page has no
+    standalone "signature". Matching SIGNATURE_PATTERN per word gives the same
+    answer as matching the page text (words never contain whitespace), so
+    page.extract_text() is not needed on top of page.extract_words().
+    """
+    # One pass: remember the first word containing "signature" and stop at
+    # the first standalone match (which contains it too, so first is set)
+    first = None
+    for word in words:
+        text = word['text']
+        if first is None and 'signature' in text.lower():
+            first = word
+        if SIGNATURE_PATTERN.search(text):
+            return first
+    return None
+
+
+@cached_by_file
+def detect_all_signature_positions(pdf_path: str, first_only: bool = False) -> dict:
     """
     Detect signature positions across ALL pages of a PDF using pdfplumber.
     Returns at most ONE signature position per page (0 or 1 per page).
@@ -362,6 +409,7 @@ def detect_all_signature_positions(pdf_path: str) -> dict:
 
     Args:
         pdf_path: Path to the PDF file
+        first_only: Stop at the last page that has the keyword
 
     Returns:
         dict with:
@@ -391,64 +439,60 @@ def detect_all_signature_positions(pdf_path: str) -> dict:
                 page_height = float(page.height)
                 page_width = float(page.width)
 
-                # Extract text content
-                text_content = page.extract_text() or ""
+                # Extract words with positions (kept for the last-page fallback)
+                words = page.extract_words()
+                if page_idx == num_pages - 1:
+                    last_page_words = words
 
                 # Only search for "signature"
-                match = SIGNATURE_PATTERN.search(text_content)
-                if not match:
-                    continue  # No signature keyword on this page
-
-                # Extract words with positions
-                words = page.extract_words()
-                if not words:
+                word = find_signature_word(words)
+                if word is None:
                     continue
 
-                # Find the word "signature" position
-                for word in words:
-                    word_text = word['text'].lower()
-                    if 'signature' in word_text:
-                        # Find blank space near this keyword
-                        blank_pos = find_blank_space_near_keyword(
-                            page, word, words, SIG_WIDTH, SIG_HEIGHT
-                        )
-
-                        if blank_pos:
-                            x = blank_pos['x']
-                            y = blank_pos['y']
-                        else:
-                            # Fallback to above keyword
-                            x = float(word['x0'])
-                            y = float(word['top']) - SIG_HEIGHT - TEXT_HEIGHT - 5
-
-                        # Ensure within page bounds
-                        total_height = SIG_HEIGHT + TEXT_HEIGHT
-                        if x + SIG_WIDTH > page_width:
-                            x = page_width - SIG_WIDTH - 20
-                        if x < 10:
-                            x = 10
-                        if y < 10:
-                            y = 10
-                        if y + total_height > page_height:
-                            y = page_height - total_height - 20
-
-                        page_position = {
-                            'page': page_idx,
-                            'x': x,
-                            'y': y,
-                            'width': SIG_WIDTH,
-                            'height': SIG_HEIGHT,
-                            'confidence': 'high',
-                            'method': 'pdfplumber_blank_space',
-                            'keyword': 'signature'
-                        }
-                        positions.append(page_position)
-                        break  # Only one position per page
+                # Find blank space near this keyword
+                blank_pos = find_blank_space_near_keyword(
+                    page, word, words, SIG_WIDTH, SIG_HEIGHT
+                )
+
+                if blank_pos:
+                    x = blank_pos['x']
+                    y = blank_pos['y']
+                else:
+                    # Fallback to above keyword
+                    x = float(word['x0'])
+                    y = float(word['top']) - SIG_HEIGHT - TEXT_HEIGHT - 5
+
+                # Ensure within page bounds
+                total_height = SIG_HEIGHT + TEXT_HEIGHT
+                if x + SIG_WIDTH > page_width:
+                    x = page_width - SIG_WIDTH - 20
+                if x < 10:
+                    x = 10
+                if y < 10:
+                    y = 10
+                if y + total_height > page_height:
+                    y = page_height - total_height - 20
+
+                page_position = {
+                    'page': page_idx,
+                    'x': x,
+                    'y': y,
+                    'width': SIG_WIDTH,
+                    'height': SIG_HEIGHT,
+                    'confidence': 'high',
+                    'method': 'pdfplumber_blank_space',
+                    'keyword': 'signature'
+                }
+                positions.append(page_position)
+                if first_only:
+                    break
 
             # If no keyword found on any page, fallback to blank space on last page
             if not positions:
                 last_page = pdf.pages[num_pages - 1]
-                blank_pos = find_blank_space_on_page(last_page, SIG_WIDTH, SIG_HEIGHT, avoid_center=True)
+                blank_pos = find_blank_space_on_page(
+                    last_page, SIG_WIDTH, SIG_HEIGHT, avoid_center=True, words=last_page_words
+                )
 
                 if blank_pos:
                     page_position = {
@@ -469,7 +513,7 @@ def detect_all_signature_positions(pdf_path: str) -> dict:
                 result['positions'] = sorted(positions, key=lambda p: p['page'])
 
     except Exception as e:
-        print(f"Error detecting signature positions: {e}")
+        logger.warning("Error detecting signature positions in %s: %s", pdf_path, e)
 
     return result
 
@@ -509,111 +553,15 @@ def detect_signature_position(pdf_path: str) -> dict:
         'keyword': None
     }
 
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            num_pages = len(pdf.pages)
-
-            if num_pages == 0:
-                return result
-
-            # Search from last page backwards (signature usually at end)
-            for page_idx in range(num_pages - 1, -1, -1):
-                page = pdf.pages[page_idx]
-                page_height = float(page.height)
-                page_width = float(page.width)
-
-                # Extract text content
-                text_content = page.extract_text() or ""
-
-                # Only search for "signature"
-                match = SIGNATURE_PATTERN.search(text_content)
-                if not match:
-                    continue
-
-                # Extract words with positions
-                words = page.extract_words()
-                if not words:
-                    continue
-
-                # Find the word "signature" position
-                for word in words:
-                    word_text = word['text'].lower()
-                    if 'signature' in word_text:
-                        # Find blank space near this keyword
-                        blank_pos = find_blank_space_near_keyword(
-                            page, word, words, SIG_WIDTH, SIG_HEIGHT
-                        )
-
-                        if blank_pos:
-                            x = blank_pos['x']
-                            y = blank_pos['y']
-                        else:
-                            # Fallback to above keyword
-                            x = float(word['x0'])
-                            y = float(word['top']) - SIG_HEIGHT - TEXT_HEIGHT - 5
-
-                        # Ensure within page bounds
-                        total_height = SIG_HEIGHT + TEXT_HEIGHT
-                        if x + SIG_WIDTH > page_width:
-                            x = page_width - SIG_WIDTH - 20
-                        if x < 10:
-                            x = 10
-                        if y < 10:
-                            y = 10
-                        if y + total_height > page_height:
-                            y = page_height - total_height - 20
-
-                        result['found'] = True
-                        result['page'] = page_idx
-                        result['x'] = x
-                        result['y'] = y
-                        result['width'] = SIG_WIDTH
-                        result['height'] = SIG_HEIGHT
-                        result['confidence'] = 'high'
-                        result['method'] = 'pdfplumber_blank_space'
-                        result['keyword'] = 'signature'
-
-                        return result
-
-            # If no keyword found, fallback to blank space on last page
-            last_page = pdf.pages[num_pages - 1]
-            blank_pos = find_blank_space_on_page(last_page, SIG_WIDTH, SIG_HEIGHT, avoid_center=True)
-
-            if blank_pos:
-                result['found'] = True
-                result['page'] = num_pages - 1
-                result['x'] = blank_pos['x']
-                result['y'] = blank_pos['y']
-                result['width'] = SIG_WIDTH
-                result['height'] = SIG_HEIGHT
-                result['confidence'] = 'low'
-                result['method'] = 'blank_space_fallback'
-                result['keyword'] = None
-
-    except Exception as e:
-        print(f"Error detecting signature position: {e}")
+    detection = detect_all_signature_positions(pdf_path, first_only=True)
+    if detection['found']:
+        result['found'] = True
+        result.update(detection['positions'][0])
 
     return result
 
 
-def detect_signature_positions_batch(pdf_paths: list[str]) -> list[dict]:
-    """
-    Detect signature positions for multiple PDFs.
-
-    Args:
-        pdf_paths: List of PDF file paths
-
-    Returns:
-        List of detection results
-    """
-    results = []
-    for pdf_path in pdf_paths:
-        result = detect_signature_position(pdf_path)
-        result['pdf_path'] = pdf_path
-        results.append(result)
-    return results
-
-
+@cached_by_file
 def detect_f2f_signature_position(pdf_path: str) -> dict:
     """
     Detect signature position for F2F (Face to Face) documents.
@@ -697,8 +645,6 @@ def detect_f2f_signature_position(pdf_path: str) -> dict:
             result['positions'] = [page_position]
 
     except Exception as e:
-        print(f"Error detecting F2F signature position: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Error detecting F2F signature position in %s", pdf_path, exc_info=True)
 
     return result
@@ -5,6 +5,7 @@ Run with: python test_app.py
 
 import os
 import sys
+from importlib.util import find_spec
 
 def test_imports():
     """Test that all required modules can be imported."""
@@ -66,11 +67,10 @@ def test_imports():
         print(f"  ✗ cryptography: {e}")
         return False
 
-    # Optional: rembg
-    try:
-        from rembg import remove
+    # Optional: rembg (only looked up; importing it loads ONNX Runtime)
+    if find_spec('rembg') is not None:
         print("  ✓ rembg (optional - AI background removal)")
-    except ImportError:
+    else:
         print("  ⚠ rembg not installed (will use simple background removal)")
 
     return True
@@ -42,8 +42,8 @@ const DocumentPreviewModal = ({
         setPdfUrl(blobUrl);
 
         // Fetch signature and signer name
-        const sigResponse = await signatureAPI.preview();
-        setSignaturePreview(sigResponse.data.signature);
+        const sigResponse = await signatureAPI.info();
+        setSignaturePreview(signatureAPI.previewUrl(sigResponse.data.info.updated_at));
         setSignerName(sigResponse.data.info?.signer_name || '');
 
         // Initialize positions from detection (supports both old and new format)
@@ -66,8 +66,8 @@ const SignDocument = () => {
 
   const loadSignature = async () => {
     try {
-      const response = await signatureAPI.preview();
-      setSignaturePreview(response.data.signature);
+      const response = await signatureAPI.info();
+      setSignaturePreview(signatureAPI.previewUrl(response.data.info.updated_at));
       setSignerName(response.data.info?.signer_name || '');
     } catch (err) {
       setError('No signature found. Please upload your signature first.');
@@ -18,8 +18,8 @@ const Signature = () => {
   const loadSignature = async () => {
     setLoading(true);
     try {
-      const response = await signatureAPI.preview();
-      setSignaturePreview(response.data.signature);
+      const response = await signatureAPI.info();
+      setSignaturePreview(signatureAPI.previewUrl(response.data.info.updated_at));
       setSignerName(response.data.info?.signer_name || '');
     } catch (err) {
       // No signature found
@@ -23,7 +23,9 @@ export const signatureAPI = {
   upload: (formData) => api.post('/signatures/upload', formData, {
     headers: { 'Content-Type': 'multipart/form-data' },
   }),
-  preview: () => api.get('/signatures/preview'),
+  info: () => api.get('/signatures/info'),
+  // PNG image URL; the version (updated_at) changes the URL after a new upload
+  previewUrl: (version) => `${API_URL}/signatures/preview?v=${encodeURIComponent(version)}`,
   delete: () => api.delete('/signatures/delete'),
 };
 